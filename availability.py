@@ -0,0 +1,96 @@
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta
+
+from keyboards import BOOKING_DAYS, SLOT_MINUTES, booking_times, kyiv_now
+
+
+class BusyIndex:
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            self.add(start, end)
+
+    def add(self, start, end):
+        # Інтервали зберігаються відсортованими і злитими, тож перевірка — один bisect.
+        i = bisect.bisect_left(self.ends, start)
+        j = bisect.bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def overlaps(self, start, end):
+        i = bisect.bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class AvailabilityEngine:
+    def __init__(self, fetch_busy, calendar_ids, ttl=60, horizon_days=BOOKING_DAYS):
+        self.fetch_busy = fetch_busy
+        self.calendar_ids = sorted(set(calendar_ids))
+        self.ttl = ttl
+        self.horizon_days = horizon_days
+        self._index = {cid: BusyIndex() for cid in self.calendar_ids}
+        self._local = []
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def refresh(self, force=False):
+        if not force and not self.is_stale():
+            return
+        async with self._lock:
+            if not force and not self.is_stale():
+                return
+            started = time.monotonic()
+            time_min = kyiv_now().replace(hour=0, minute=0, second=0, microsecond=0)
+            time_max = time_min + timedelta(days=self.horizon_days + 1)
+            loop = asyncio.get_running_loop()
+            try:
+                busy = await loop.run_in_executor(None, self.fetch_busy, self.calendar_ids, time_min, time_max)
+            except Exception as e:
+                logging.error(f"❌ FreeBusy error: {e}")
+                self._loaded_at = started
+                return
+            index = {cid: BusyIndex(busy.get(cid, [])) for cid in self.calendar_ids}
+            self._local = [item for item in self._local if item[0] > started - 2 * self.ttl]
+            for _, calendar_id, start, end in self._local:
+                index.setdefault(calendar_id, BusyIndex()).add(start, end)
+            self._index = index
+            self._loaded_at = started
+
+    def add_busy(self, calendar_id, start, end):
+        self._local.append((time.monotonic(), calendar_id, start, end))
+        self._index.setdefault(calendar_id, BusyIndex()).add(start, end)
+
+    def is_free(self, calendar_id, start, minutes=SLOT_MINUTES):
+        index = self._index.get(calendar_id)
+        return index is None or not index.overlaps(start, start + timedelta(minutes=minutes))
+
+    async def free_times(self, calendar_id, date):
+        await self.refresh()
+        now = kyiv_now()
+        return tuple(
+            t for t in booking_times(date, now)
+            if self.is_free(calendar_id, datetime.fromisoformat(f"{date}T{t}"))
+        )
+
+    async def free_dates(self, calendar_id, dates):
+        await self.refresh()
+        now = kyiv_now()
+        return tuple(
+            d for d in dates
+            if any(self.is_free(calendar_id, datetime.fromisoformat(f"{d}T{t}")) for t in booking_times(d, now))
+        )
@@ -0,0 +1,125 @@
+"""Per-booking cost of building a Calendar client on every call vs the cached client.
+
+A local HTTP server stands in for both the OAuth token endpoint and the Calendar
+API, so the numbers include reading the key file, parsing the discovery
+document, the token exchange, new TCP connections and the insert itself — but
+not Google's own latency.
+
+Run: python benchmarks/bench_calendar_client.py [bookings]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+PORT = 8904
+ENDPOINT = f"http://127.0.0.1:{PORT}/"
+os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = ENDPOINT
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+import google_calendar
+
+
+class FakeGoogle(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    counts = {"token": 0, "insert": 0, "connections": set()}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.lock:
+            self.counts["connections"].add(self.client_address)
+            if self.path.startswith("/token"):
+                self.counts["token"] += 1
+                result = {"access_token": "bench-token", "expires_in": 3600, "token_type": "Bearer"}
+            else:
+                self.counts["insert"] += 1
+                result = dict(json.loads(body or b"{}"), status="confirmed")
+        payload = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def write_service_account(folder):
+    _, private_key = rsa.newkeys(2048)
+    info = {
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "bench",
+        "private_key": private_key.save_pkcs1().decode(),
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": f"{ENDPOINT}token",
+    }
+    path = os.path.join(folder, "creds.json")
+    with open(path, "w") as f:
+        json.dump(info, f)
+    return path
+
+
+def legacy_insert(i):
+    # Як було до кешу: ключ, discovery і токен — на кожну заявку.
+    creds = service_account.Credentials.from_service_account_file(
+        google_calendar.SERVICE_ACCOUNT_FILE, scopes=google_calendar.SCOPES)
+    service = build("calendar", "v3", credentials=creds, client_options={"api_endpoint": ENDPOINT})
+    return service.events().insert(calendarId="bench", body={"summary": f"legacy {i}"}).execute()
+
+
+def cached_insert(i):
+    return google_calendar.add_to_calendar(
+        f"cached {i}", "", "2030-01-01 10:00", "СТО - Діагностика", calendar_id="bench")
+
+
+def run(name, insert, bookings, threads):
+    FakeGoogle.counts.update(token=0, insert=0, connections=set())
+    samples = []
+
+    def timed(i):
+        started = time.perf_counter()
+        insert(i)
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(timed, range(bookings)))
+    total = time.perf_counter() - started
+    samples.sort()
+    counts = FakeGoogle.counts
+    print(
+        f"{name:>7}: {total / bookings * 1000:7.2f} ms/booking wall, "
+        f"p50 {samples[len(samples) // 2] * 1000:7.2f} ms, p95 {samples[int(len(samples) * 0.95)] * 1000:7.2f} ms, "
+        f"token requests {counts['token']}, connections {len(counts['connections'])}"
+    )
+    return samples[len(samples) // 2]
+
+
+def main(bookings, threads=4):
+    server = ThreadingHTTPServer(("127.0.0.1", PORT), FakeGoogle)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as folder:
+        google_calendar.SERVICE_ACCOUNT_FILE = write_service_account(folder)
+        legacy = run("legacy", legacy_insert, bookings, threads)
+        cached = run("cached", cached_insert, bookings, threads)
+    print(f"saving per booking (p50): {(legacy - cached) * 1000:.2f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
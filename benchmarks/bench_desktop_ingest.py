@@ -0,0 +1,97 @@
+"""Messages per second into the desktop app: one request per message vs /batch.
+
+Both modes go through the real LocalAPIServer (HMAC check, JSON parsing) and
+write to a fresh SQLite database with desktop_app.storage.Database; the single
+mode stores each message the way MainWindow._handle_incoming does.
+
+Run: python benchmarks/bench_desktop_ingest.py [messages] [batch_size]
+"""
+import hmac
+import json
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "desktop_app"))
+
+from local_api import BATCH_PATH, INCOMING_PATH, LocalAPIServer
+from storage import Database
+
+PORT = 8905
+SECRET = "bench-secret"
+
+
+def make_payload(i):
+    return {
+        "chat_id": str(100000 + i % 500),
+        "user_name": f"Client {i % 500}",
+        "text": f"message {i}",
+        "ts": f"2030-01-01T10:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}",
+        "message_id": str(i),
+    }
+
+
+def post(session, path, body):
+    signature = hmac.new(SECRET.encode("utf-8"), body, "sha256").hexdigest()
+    resp = session.post(f"http://127.0.0.1:{PORT}{path}", data=body, headers={"X-Signature": signature})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def run(name, db, messages, send):
+    server = LocalAPIServer(
+        "127.0.0.1",
+        PORT,
+        SECRET,
+        lambda p: (db.upsert_chat(p["chat_id"], p["user_name"]),
+                   db.add_message(p["chat_id"], "in", p["text"], p["ts"], "sent", json.dumps(p))),
+        lambda payloads: db.add_incoming_batch(
+            [(p["chat_id"], p["user_name"], p["text"], p["ts"], json.dumps(p)) for p in payloads]),
+    )
+    server.start()
+    while server.httpd is None:
+        time.sleep(0.01)
+    with requests.Session() as session:
+        started = time.perf_counter()
+        send(session)
+        elapsed = time.perf_counter() - started
+    server.stop()
+    server.httpd.server_close()
+    print(f"{name:>7}: {messages / elapsed:9.1f} msg/s ({elapsed:.2f} s for {messages})")
+    return messages / elapsed
+
+
+def main(messages, batch_size):
+    payloads = [make_payload(i) for i in range(messages)]
+    with tempfile.TemporaryDirectory() as folder:
+        single_db = Database(os.path.join(folder, "single.db"))
+        single = run("single", single_db, messages, lambda session: [
+            post(session, INCOMING_PATH, json.dumps(p).encode("utf-8")) for p in payloads
+        ])
+
+        batch_db = Database(os.path.join(folder, "batch.db"))
+
+        def send_batches(session):
+            for start in range(0, messages, batch_size):
+                chunk = payloads[start:start + batch_size]
+                body = "".join(json.dumps(p) + "\n" for p in chunk).encode("utf-8")
+                result = post(session, BATCH_PATH, body)
+                assert result["accepted"] == len(chunk), result
+
+        batch = run("batch", batch_db, messages, send_batches)
+        for name, db in (("single", single_db), ("batch", batch_db)):
+            with db._get_conn() as conn:
+                stored = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            assert stored == messages, (name, stored)
+    print(f"batch/single: {batch / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
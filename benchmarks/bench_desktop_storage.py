@@ -0,0 +1,112 @@
+"""Desktop storage ingest: per-call connections, per-thread WAL connections, group commit.
+
+Several writer threads store messages, standing in for ThreadingHTTPServer
+workers, while one reader keeps calling get_chats() like the Qt chat list
+refresh. legacy/pooled write upsert_chat + add_message per message (two
+transactions); group submits to WriteQueue and waits for its future, as
+MainWindow._handle_incoming does now.
+
+Run: python benchmarks/bench_desktop_storage.py [messages_per_writer] [writers] [max_delay]
+
+max_delay (seconds, default 0) is passed to WriteQueue to compare a linger window
+against greedy group commit.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "desktop_app"))
+
+from storage import Database
+from write_queue import WriteQueue
+
+
+class LegacyDatabase(Database):
+    # As before the pooled layer: rollback journal, fresh connection and commit per call.
+    def _get_conn(self):
+        return sqlite3.connect(self.db_path)
+
+    @contextmanager
+    def _write(self):
+        with self._get_conn() as conn:
+            yield conn
+
+
+def direct_ingest(db):
+    def ingest(chat_id, name, text, ts):
+        db.upsert_chat(chat_id, name)
+        db.add_message(chat_id, "in", text, ts, "sent", "{}")
+    return ingest
+
+
+def group_ingest(write_queue):
+    def ingest(chat_id, name, text, ts):
+        write_queue.submit(chat_id, name, text, ts, "{}").result()
+    return ingest
+
+
+def run(name, db, messages, writers, ingest):
+    errors = []
+    done = threading.Event()
+    reads = [0]
+
+    def writer(w):
+        for i in range(messages):
+            chat_id = str(100000 + (w * messages + i) % 300)
+            ts = f"2030-01-01T{w:02d}:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}"
+            try:
+                ingest(chat_id, f"Client {chat_id}", f"message {i}", ts)
+            except sqlite3.OperationalError as exc:
+                errors.append(str(exc))
+
+    def reader():
+        while not done.is_set():
+            db.get_chats()
+            reads[0] += 1
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    reader_thread.join()
+    total = messages * writers
+    print(
+        f"{name:>7}: {total / elapsed:8.1f} msg/s ({elapsed:.2f} s), "
+        f"locked errors {len(errors)}, chat list reads {reads[0]}"
+    )
+    return total / elapsed
+
+
+def main(messages, writers, max_delay):
+    with tempfile.TemporaryDirectory() as folder:
+        legacy_db = LegacyDatabase(os.path.join(folder, "legacy.db"))
+        legacy = run("legacy", legacy_db, messages, writers, direct_ingest(legacy_db))
+        pooled_db = Database(os.path.join(folder, "pooled.db"))
+        pooled = run("pooled", pooled_db, messages, writers, direct_ingest(pooled_db))
+        pooled_db.close()
+        group_db = Database(os.path.join(folder, "group.db"))
+        write_queue = WriteQueue(group_db, max_delay=max_delay)
+        group = run("group", group_db, messages, writers, group_ingest(write_queue))
+        write_queue.close()
+        print(f"  group commit: {write_queue.stats()['avg_batch']:.1f} messages per transaction")
+        group_db.close()
+    print(f"pooled/legacy: {pooled / legacy:.1f}x, group/legacy: {group / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+    )
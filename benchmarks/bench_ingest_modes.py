@@ -0,0 +1,92 @@
+"""Update-to-reply latency for polling vs webhook ingestion against a fake Telegram.
+
+Run: python benchmarks/bench_ingest_modes.py [updates]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ["DESKTOP_SHARED_SECRET"] = ""
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.bot.api import TelegramAPIServer
+from aiohttp import web
+
+import bot as bot_module
+from fake_telegram import FakeTelegram, make_update
+from webhook import SECRET_HEADER, make_webhook_app
+
+WEBHOOK_PORT = 8902
+SECRET = "bench-secret"
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95)] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+async def bench_polling(fake, total, first_id):
+    dp = bot_module.dp
+    polling = asyncio.create_task(dp.start_polling(timeout=20, relax=0.1))
+    await asyncio.sleep(0.3)
+    samples = []
+    for i in range(total):
+        uid = first_id + i
+        reply = fake.wait_reply(uid)
+        started = time.perf_counter()
+        fake.push_update(make_update(uid, uid, "/start"))
+        samples.append(await reply - started)
+    dp.stop_polling()
+    fake.push_update(make_update(first_id + total, first_id + total, "/start"))
+    await polling
+    return summary(samples)
+
+
+async def bench_webhook(fake, total, first_id):
+    app = make_webhook_app(bot_module.dp, "/webhook", SECRET)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", WEBHOOK_PORT).start()
+    samples = []
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}/webhook"
+    async with aiohttp.ClientSession() as session:
+        for i in range(total):
+            uid = first_id + i
+            reply = fake.wait_reply(uid)
+            started = time.perf_counter()
+            async with session.post(url, data=json.dumps(make_update(uid, uid, "/start")),
+                                    headers={SECRET_HEADER: SECRET, "Content-Type": "application/json"}):
+                pass
+            samples.append(await reply - started)
+    await runner.cleanup()
+    return summary(samples)
+
+
+async def main(total):
+    fake = FakeTelegram()
+    await fake.start()
+    bot_module.bot.server = TelegramAPIServer.from_base(fake.base_url)
+    Bot.set_current(bot_module.bot)
+    Dispatcher.set_current(bot_module.dp)
+    results = {
+        "polling": await bench_polling(fake, total, 1_000_000),
+        "webhook": await bench_webhook(fake, total, 2_000_000),
+    }
+    for mode, result in results.items():
+        print(f"{mode:>8}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
+    await fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,95 @@
+"""Per-update dispatch latency: chained lambda filters vs StepRouter.
+
+Run: python benchmarks/bench_step_router.py [updates]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from aiogram import Bot, Dispatcher, types
+
+from session_store import SessionStore
+from step_router import StepRouter
+
+STEPS = ["stype", "brand", "brand_manual", "model", "model_manual", "year", "subtype", "date", "time", "phone"]
+USERS = 1000
+
+
+def make_update(update_id, user_id):
+    return types.Update(**{
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "bench",
+        },
+    })
+
+
+async def noop(message, *args):
+    return None
+
+
+def filter_chain_dispatcher(bot):
+    # Відтворює стару схему: по фільтру-лямбді на кожен крок у порядку реєстрації.
+    user_data = {uid: {"step": STEPS[uid % len(STEPS)]} for uid in range(USERS)}
+    dp = Dispatcher(bot)
+    dp.register_message_handler(noop, commands=["start"])
+    dp.register_message_handler(noop, lambda m: m.text == "🚀 Почати")
+    for step in STEPS:
+        dp.register_message_handler(noop, lambda m, step=step: user_data.get(m.from_user.id, {}).get("step") == step)
+    return dp
+
+
+def router_dispatcher(bot):
+    sessions = SessionStore(ttl=3600, max_sessions=USERS * 2)
+    for uid in range(USERS):
+        sessions.create(uid, step=STEPS[uid % len(STEPS)])
+    router = StepRouter({step: () for step in STEPS})
+    for step in STEPS:
+        router.step(step)(noop)
+    dp = Dispatcher(bot)
+    dp.register_message_handler(noop, commands=["start"])
+    dp.register_message_handler(noop, lambda m: m.text == "🚀 Почати")
+
+    async def route_step(m):
+        session = sessions.get(m.from_user.id)
+        if session is not None:
+            await router.dispatch(session, m)
+    dp.register_message_handler(route_step, content_types=types.ContentType.TEXT)
+    return dp
+
+
+async def measure(dp, updates):
+    Dispatcher.set_current(dp)
+    for update in updates[:200]:
+        await dp.process_update(update)
+    samples = []
+    for update in updates:
+        started = time.perf_counter()
+        await dp.process_update(update)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[int(len(samples) * 0.99)] * 1e6,
+    }
+
+
+async def main(total):
+    bot = Bot(token="123456:BENCH")
+    Bot.set_current(bot)
+    updates = [make_update(i, i % USERS) for i in range(total)]
+    for name, factory in (("filter chain", filter_chain_dispatcher), ("step router", router_dispatcher)):
+        result = await measure(factory(bot), updates)
+        print(f"{name:>12}: mean {result['mean_us']:.1f} µs, p50 {result['p50_us']:.1f} µs, p99 {result['p99_us']:.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,119 @@
+"""Local stand-in for the Telegram Bot API used by the benchmarks.
+
+Serves getUpdates (long polling from an in-memory queue), records every
+sendMessage with its arrival time (and the last one per chat) and answers
+everything else with ok.
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+
+def make_update(update_id, user_id, text=None, contact=None, first_name="Bench"):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": first_name},
+    }
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    if contact is not None:
+        message["contact"] = {"phone_number": contact, "first_name": first_name, "user_id": user_id}
+    return {"update_id": update_id, "message": message}
+
+
+class FakeTelegram:
+    def __init__(self, host="127.0.0.1", port=8901, send_latency=0.0):
+        self.host = host
+        self.port = port
+        self.send_latency = send_latency
+        self.sent = []
+        self.last_message = {}
+        self.waiters = {}
+        self._updates = []
+        self._new_update = asyncio.Event()
+        self._next_message_id = 1
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def push_update(self, update):
+        self._updates.append(update)
+        self._new_update.set()
+
+    def wait_reply(self, chat_id):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(str(chat_id), []).append(future)
+        return future
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "getMe":
+            return self._ok({"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"})
+        if method == "getWebhookInfo":
+            return self._ok({"url": "", "has_custom_certificate": False, "pending_update_count": 0})
+        if method == "sendMessage":
+            return await self._send_message(params)
+        return self._ok(True)
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._ok(list(self._updates))
+
+    async def _send_message(self, params):
+        received = time.perf_counter()
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        chat_id = str(params.get("chat_id"))
+        self.sent.append((received, chat_id, params.get("text", "")))
+        self.last_message[chat_id] = params
+        waiters = self.waiters.get(chat_id)
+        if waiters:
+            future = waiters.pop(0)
+            if not future.done():
+                future.set_result(received)
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return self._ok({
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "text": params.get("text", ""),
+        })
+
+    def _ok(self, result):
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
@@ -0,0 +1,275 @@
+"""Load test: N concurrent customers walking the whole booking flow through bot.dp.
+
+Telegram is replaced by fake_telegram.FakeTelegram, Google Calendar by local
+stand-ins with configurable latency. Every update goes through
+dp.process_update, so the numbers include filters, the step router, keyboards,
+availability lookups, the outbox and the manager notifier.
+
+Run: python benchmarks/load_test.py --customers 1000 --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def percentiles(samples, scale=1000):
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * scale
+    return {
+        "count": len(samples),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": samples[-1] * scale,
+    }
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class LoadTest:
+    def __init__(self, bot_module, fake, args):
+        self.bot_module = bot_module
+        self.fake = fake
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies = {}
+        self.errors = 0
+        self.outcomes = {}
+        self.loop_lag = []
+        self.session_samples = []
+        self._update_id = 0
+        self._running = True
+
+    def _next_update_id(self):
+        self._update_id += 1
+        return self._update_id
+
+    async def send(self, uid, label, text=None, contact=None):
+        from aiogram import types
+        from fake_telegram import make_update
+
+        update = types.Update(**make_update(self._next_update_id(), uid, text, contact))
+        started = time.perf_counter()
+        try:
+            await self.bot_module.dp.process_update(update)
+        except Exception:
+            self.errors += 1
+        self.latencies.setdefault(label, []).append(time.perf_counter() - started)
+        if self.args.think_ms:
+            await asyncio.sleep(self.rng.uniform(0, self.args.think_ms) / 1000)
+        return self.fake.last_message.get(str(uid), {})
+
+    @staticmethod
+    def buttons(reply):
+        markup = reply.get("reply_markup")
+        if not markup:
+            return []
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        return [
+            button["text"] if isinstance(button, dict) else button
+            for row in markup.get("keyboard", []) for button in row
+        ]
+
+    async def customer(self, uid):
+        from config import POPULAR_CARS, SERVICE_TYPES
+
+        rng = self.rng
+        await self.send(uid, "start", "/start")
+        await self.send(uid, "start_button", self.bot_module.START_BUTTON)
+        stype = rng.choice(list(SERVICE_TYPES))
+        await self.send(uid, "stype", stype)
+        brand = rng.choice(list(POPULAR_CARS))
+        await self.send(uid, "brand", brand)
+        await self.send(uid, "model", rng.choice(POPULAR_CARS[brand]))
+        await self.send(uid, "year", str(rng.randint(2000, datetime.now().year)))
+        reply = await self.send(uid, "subtype", rng.choice(SERVICE_TYPES[stype]["subtypes"]))
+
+        if SERVICE_TYPES[stype]["requires_datetime"]:
+            dates = self.buttons(reply)
+            if dates:
+                reply = await self.send(uid, "date", rng.choice(dates))
+            # Поки клієнт обирав, слот міг зайняти інший — бот повертає оновлену клавіатуру.
+            for _ in range(self.args.max_retries):
+                times = self.buttons(reply)
+                if not times:
+                    break
+                reply = await self.send(uid, "time", rng.choice(times))
+                if not reply.get("text", "").startswith("❗"):
+                    break
+            session = self.bot_module.sessions.get(uid)
+            if session is None or session.step != "phone":
+                self.outcomes["no_slot"] = self.outcomes.get("no_slot", 0) + 1
+                return
+
+        reply = await self.send(uid, "contact", contact=f"+38050{uid % 10_000_000:07d}")
+        outcome = "booked" if reply.get("text", "").startswith("✅") else "unexpected_reply"
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    async def monitor(self, interval=0.05):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, loop.time() - expected))
+            self.session_samples.append(len(self.bot_module.sessions))
+
+    async def run(self):
+        args = self.args
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(uid):
+            async with semaphore:
+                await self.customer(uid)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        rss_before = rss_kb()
+        monitor = asyncio.create_task(self.monitor())
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(args.first_user_id + i) for i in range(args.customers)))
+        duration = time.perf_counter() - started
+        memory = {"rss_growth_kb": rss_kb() - rss_before}
+        if args.tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            memory.update(traced_kb=current / 1024, traced_peak_kb=peak / 1024)
+            tracemalloc.stop()
+        self._running = False
+        await monitor
+
+        all_latencies = [sample for samples in self.latencies.values() for sample in samples]
+        return {
+            "config": vars(args),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_s": duration,
+            "updates": len(all_latencies),
+            "errors": self.errors,
+            "throughput_updates_per_s": len(all_latencies) / duration,
+            "throughput_customers_per_s": args.customers / duration,
+            "outcomes": self.outcomes,
+            "handler_latency_ms": percentiles(all_latencies),
+            "step_latency_ms": {label: percentiles(samples) for label, samples in self.latencies.items()},
+            "loop_lag_ms": percentiles(self.loop_lag),
+            "sessions": {
+                "peak": max(self.session_samples, default=0),
+                "end": len(self.bot_module.sessions),
+                "store": self.bot_module.sessions.stats(),
+            },
+            "memory": memory,
+            "outbox": self.bot_module.outbox.counts(),
+            "telegram_messages": len(self.fake.sent),
+            "outbound": self.bot_module.outbound.stats(),
+            "metrics": self.bot_module.metrics.REGISTRY.snapshot()["histograms"],
+        }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=500, help="customers in flight at once")
+    parser.add_argument("--think-ms", type=float, default=20, help="max pause between a customer's messages")
+    parser.add_argument("--telegram-latency-ms", type=float, default=5)
+    parser.add_argument("--calendar-latency-ms", type=float, default=80)
+    parser.add_argument("--max-retries", type=int, default=5, help="slot-conflict retries per customer")
+    parser.add_argument("--first-user-id", type=int, default=5_000_000)
+    parser.add_argument("--port", type=int, default=8903)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="trace Python allocations (precise, but slows the run several times)")
+    parser.add_argument("--output", default="", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="stobot-load-")
+    os.environ.setdefault("BOT_TOKEN", "123456:LOAD")
+    os.environ.setdefault("MANAGER_BOT_TOKEN", "654321:LOAD")
+    os.environ["DESKTOP_SHARED_SECRET"] = ""
+    os.environ["BOT_DB_PATH"] = os.path.join(workdir, "bot.db")
+    os.environ["SESSION_DB_PATH"] = ""
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ["METRICS_SNAPSHOT_PATH"] = os.path.join(workdir, "metrics.json")
+    # Навантажуємо бота, а не ліміт Telegram для груп менеджерів.
+    os.environ.setdefault("MANAGER_NOTIFY_PER_MINUTE", "100000")
+    # Симульовані клієнти тиснуть кнопки швидше за людей — middleware працює, але не ріже.
+    os.environ.setdefault("THROTTLE_LIMITS", "default=100000/1000")
+    os.environ.setdefault("OUTBOUND_GLOBAL_PER_SECOND", "100000")
+    os.environ.setdefault("OUTBOUND_CHAT_PER_SECOND", "1000")
+
+    import logging
+    from aiogram import Bot, Dispatcher
+    from aiogram.bot.api import TelegramAPIServer
+    from fake_telegram import FakeTelegram
+
+    import bot as bot_module
+
+    logging.getLogger().setLevel(logging.WARNING)
+    fake = FakeTelegram(port=args.port, send_latency=args.telegram_latency_ms / 1000)
+    await fake.start()
+    bot_module.bot.server = TelegramAPIServer.from_base(fake.base_url)
+    bot_module.notifier.api_base = fake.base_url
+    Bot.set_current(bot_module.bot)
+    Dispatcher.set_current(bot_module.dp)
+
+    calendar_latency = args.calendar_latency_ms / 1000
+
+    def fake_free_busy(calendar_ids, time_min, time_max):
+        time.sleep(calendar_latency)
+        return {calendar_id: [] for calendar_id in calendar_ids}
+
+    def fake_insert_event(calendar_id, event_id=None, **booking):
+        time.sleep(calendar_latency)
+        return {"id": event_id}
+
+    bot_module.availability.fetch_busy = fake_free_busy
+    if bot_module.mirror is not None:
+        bot_module.mirror.fetch_changes = lambda calendar_id, sync_token=None, time_min=None: ([], "load-test")
+    bot_module.outbox.insert_event = fake_insert_event
+
+    await bot_module.on_startup(bot_module.dp)
+    results = await LoadTest(bot_module, fake, args).run()
+    await bot_module.on_shutdown(bot_module.dp)
+    session = await bot_module.bot.get_session()
+    await session.close()
+    await fake.stop()
+
+    latency = results["handler_latency_ms"]
+    lag = results["loop_lag_ms"]
+    print(
+        f"{results['updates']} updates in {results['duration_s']:.1f}s "
+        f"({results['throughput_updates_per_s']:.0f} upd/s), outcomes {results['outcomes']}\n"
+        f"handler p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms\n"
+        f"loop lag p95 {lag.get('p95', 0):.2f} ms, max {lag.get('max', 0):.2f} ms; "
+        f"sessions peak {results['sessions']['peak']}, RSS growth {results['memory']['rss_growth_kb']} KiB"
+    )
+    if args.output:
+        folder = os.path.dirname(args.output)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📄 {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args(sys.argv[1:])))
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT UNIQUE NOT NULL,
+    calendar_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    event_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON calendar_outbox(status, next_attempt_at);
+"""
+
+PERMANENT_ERRORS = (400, 404)
+
+
+def booking_key(user_id, start_str):
+    return f"{user_id}:{start_str}"
+
+
+def event_id_for(key):
+    # Hex — підмножина base32hex, тож годиться як власний id події Google Calendar.
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _http_status(exc):
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+class CalendarOutbox:
+    def __init__(self, path, insert_event, max_attempts=8, base_delay=5, max_delay=600,
+                 poll_interval=5, on_delivered=None, get_event=None):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.insert_event = insert_event
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.on_delivered = on_delivered
+        self.get_event = get_event
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._wakeup = asyncio.Event()
+
+    def enqueue(self, calendar_id, booking):
+        key = booking_key(booking["user_id"], booking["start_str"])
+        now = time.time()
+        with self._conn:
+            # Після скасування той самий слот можна забронювати знову — з новим id події,
+            # бо Google не дає перевикористати id видаленої.
+            revision = self._conn.execute(
+                "SELECT COUNT(*) FROM calendar_outbox WHERE idempotency_key > ? AND idempotency_key < ?",
+                (f"{key}#", f"{key}$"),
+            ).fetchone()[0]
+            event_id = event_id_for(f"{key}#{revision}" if revision else key)
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO calendar_outbox(
+                    idempotency_key, calendar_id, payload, status, attempts,
+                    next_attempt_at, event_id, created_at, updated_at)
+                VALUES (?, ?, ?, 'pending', 0, ?, ?, ?, ?)
+                """,
+                (key, calendar_id, json.dumps(booking, ensure_ascii=False), now, event_id, now, now),
+            )
+        if cursor.rowcount == 0:
+            logging.info(f"ℹ️ Бронювання {key} вже є в outbox")
+        self._wakeup.set()
+        return key
+
+    def list(self, status=None, limit=100):
+        if status:
+            rows = self._conn.execute(
+                "SELECT * FROM calendar_outbox WHERE status = ? ORDER BY id LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._conn.execute("SELECT * FROM calendar_outbox ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def pending(self, limit=100):
+        return self.list("pending", limit)
+
+    def failed(self, limit=100):
+        return self.list("failed", limit)
+
+    def counts(self):
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM calendar_outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def pending_busy(self, calendar_ids, time_min, time_max, minutes=30):
+        # Записи, що ще чекають на Calendar, теж займають слот — для всіх шардів, скільки б не тривали повтори.
+        # Викликається з пулу потоків, тому окреме з'єднання лише для читання.
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT calendar_id, payload FROM calendar_outbox WHERE status = 'pending'"
+            ).fetchall()
+        finally:
+            conn.close()
+        busy = {}
+        for calendar_id, payload in rows:
+            if calendar_id not in calendar_ids:
+                continue
+            booking = json.loads(payload)
+            start = datetime.strptime(booking["start_str"], "%Y-%m-%d %H:%M")
+            end = start + timedelta(minutes=booking.get("duration_minutes", minutes))
+            if start < time_max and end > time_min:
+                busy.setdefault(calendar_id, []).append((start, end))
+        return busy
+
+    def cancel(self, event_id):
+        # Подію видалено з календаря: звільняємо ключ, щоб повторне бронювання слота не загубилось.
+        with self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE calendar_outbox
+                SET idempotency_key = idempotency_key || '#' || id, status = 'cancelled', updated_at = ?
+                WHERE event_id = ? AND status != 'cancelled'
+                """,
+                (time.time(), event_id),
+            )
+        return cursor.rowcount > 0
+
+    def retry(self, entry_id):
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE calendar_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ?
+                WHERE id = ? AND status = 'failed'
+                """,
+                (now, now, entry_id),
+            )
+        self._wakeup.set()
+        return cursor.rowcount > 0
+
+    def _claim_due(self, limit=20, lease=120):
+        now = time.time()
+        rows = self._conn.execute(
+            """
+            SELECT * FROM calendar_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at LIMIT ?
+            """,
+            (now, limit),
+        ).fetchall()
+        claimed = []
+        # Оренда через next_attempt_at: інший процес (шард) не візьме той самий запис.
+        with self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "UPDATE calendar_outbox SET next_attempt_at = ? WHERE id = ? AND next_attempt_at = ?",
+                    (now + lease, row["id"], row["next_attempt_at"]),
+                )
+                if cursor.rowcount:
+                    claimed.append(row)
+        return claimed
+
+    def _mark(self, entry_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._conn:
+            self._conn.execute(
+                f"UPDATE calendar_outbox SET {assignments} WHERE id = ?", (*fields.values(), entry_id)
+            )
+
+    async def deliver(self, entry):
+        booking = json.loads(entry["payload"])
+        event_id = entry["event_id"] or event_id_for(entry["idempotency_key"])
+        loop = asyncio.get_running_loop()
+        try:
+            event = await loop.run_in_executor(
+                None, lambda: self.insert_event(calendar_id=entry["calendar_id"], event_id=event_id, **booking)
+            )
+        except Exception as e:
+            status = _http_status(e)
+            attempts = entry["attempts"] + 1
+            if status == 409:
+                return await self._delivered_earlier(entry, booking, event_id, attempts)
+            if status in PERMANENT_ERRORS or attempts >= self.max_attempts:
+                logging.error(f"❌ Calendar outbox #{entry['id']} failed: {e}")
+                self._mark(entry["id"], status="failed", attempts=attempts, last_error=str(e))
+                return False
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            logging.warning(f"⚠️ Calendar outbox #{entry['id']} attempt {attempts} failed: {e}")
+            self._mark(entry["id"], attempts=attempts, last_error=str(e), next_attempt_at=time.time() + delay)
+            return False
+        self._mark(entry["id"], status="done", attempts=entry["attempts"] + 1,
+                   event_id=(event or {}).get("id", event_id), last_error=None)
+        if self.on_delivered:
+            self.on_delivered(entry["calendar_id"], booking, event)
+        return True
+
+    async def _delivered_earlier(self, entry, booking, event_id, attempts):
+        # 409: попередня спроба вставила подію, але відповідь загубилась. Дочитуємо її для on_delivered.
+        event = None
+        if self.get_event:
+            try:
+                event = await asyncio.get_running_loop().run_in_executor(
+                    None, self.get_event, entry["calendar_id"], event_id
+                )
+            except Exception as e:
+                logging.warning(f"⚠️ Не вдалося прочитати подію {event_id}: {e}")
+        if event and event.get("status") == "cancelled":
+            logging.error(f"❌ Calendar outbox #{entry['id']}: подію {event_id} вже видалено з календаря")
+            self._mark(entry["id"], status="failed", attempts=attempts, event_id=event_id,
+                       last_error="event was deleted")
+            return False
+        logging.info(f"ℹ️ Подія {event_id} вже існує — вважаємо доставленою")
+        self._mark(entry["id"], status="done", attempts=attempts, event_id=event_id, last_error=None)
+        if self.on_delivered:
+            self.on_delivered(entry["calendar_id"], booking, event)
+        return True
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                for entry in self._claim_due():
+                    await self.deliver(entry)
+            except sqlite3.Error as e:
+                logging.error(f"❌ Calendar outbox error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv):
+    path = os.getenv("BOT_DB_PATH", "data/bot.db")
+    outbox = CalendarOutbox(path, insert_event=None)
+    command = argv[1] if len(argv) > 1 else "pending"
+    if command == "retry":
+        for entry_id in argv[2:]:
+            print(f"#{entry_id}: {'ok' if outbox.retry(int(entry_id)) else 'not failed / not found'}")
+    elif command == "counts":
+        print(json.dumps(outbox.counts(), indent=2))
+    else:
+        for entry in outbox.list(None if command == "all" else command):
+            print(json.dumps(entry, ensure_ascii=False))
+    outbox.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
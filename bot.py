@@ -2,17 +2,31 @@ import logging
 import os
 import asyncio
 from datetime import datetime, timedelta
-from aiogram import Bot, Dispatcher, types
-from aiogram.types import BotCommand, ReplyKeyboardMarkup, KeyboardButton
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from aiogram import Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
+from aiogram.types import BotCommand
+from apscheduler.triggers.cron import CronTrigger
 from dotenv import load_dotenv
-import requests
-from google_calendar import add_to_calendar
+from google_calendar import (add_to_calendar, get_event, query_free_busy, sync_events,
+                             get_upcoming_events_for_reminders, get_reminders_between, reminder_from_event)
 from aiogram.types import BotCommand
 import asyncio
-from reminder import run_daily_check
+from reminder import run_daily_check, send_reminder
+from reminder_ledger import ReminderLedger
+from reminder_scheduler import ReminderScheduler
 from config import SERVICE_TYPES, POPULAR_CARS
-from desktop_push import push_to_desktop
+from desktop_push import push_to_desktop, get_pusher
+from manager_notify import ManagerNotifier
+from session_store import SessionStore, SQLiteSessionBackend
+from step_router import StepRouter
+from keyboards import KeyboardCache, booking_dates, kyiv_now, SLOT_MINUTES, START_BUTTON, OTHER_BRAND, OTHER_MODEL
+from availability import AvailabilityEngine
+from booking_outbox import CalendarOutbox
+from calendar_mirror import CalendarMirror
+from outbound import ScheduledBot, scheduler_for
+import metrics
+from throttling import ThrottlingMiddleware, parse_limits, DEFAULT_LIMITS
+from jobs import JobRunner, create_scheduler, ensure_jobs
 
 async def setup_bot_commands():
     commands = [
@@ -23,11 +37,202 @@ async def setup_bot_commands():
 load_dotenv()
 API_TOKEN = os.getenv("BOT_TOKEN")
 MANAGER_TOKEN = os.getenv("MANAGER_BOT_TOKEN")
+TELEGRAM_API_SERVER = os.getenv("TELEGRAM_API_SERVER", "")
+BOT_DB_PATH = os.getenv("BOT_DB_PATH", "data/bot.db")
+# Шардований режим (sharded.py): фонові задачі крутить лише шард 0, а глобальний і груповий
+# ліміти Telegram діляться між шардами. Чат користувача завжди на одному шарді — його ліміт не ділиться.
+BOT_SHARD = int(os.getenv("BOT_SHARD", "0"))
+BOT_SHARDS = max(1, int(os.getenv("BOT_SHARDS", "1")))
+RUN_BACKGROUND = BOT_SHARD == 0
 
 logging.basicConfig(level=logging.INFO)
-bot = Bot(token=API_TOKEN)
+outbound = scheduler_for(
+    API_TOKEN,
+    global_per_second=float(os.getenv("OUTBOUND_GLOBAL_PER_SECOND", "30")) / BOT_SHARDS,
+    chat_per_second=float(os.getenv("OUTBOUND_CHAT_PER_SECOND", "1")),
+    group_per_minute=float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20")) / BOT_SHARDS,
+)
+bot = ScheduledBot(
+    token=API_TOKEN,
+    server=TelegramAPIServer.from_base(TELEGRAM_API_SERVER) if TELEGRAM_API_SERVER else TELEGRAM_PRODUCTION,
+)
 dp = Dispatcher(bot)
-user_data = {}
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+sessions = SessionStore(
+    ttl=int(os.getenv("SESSION_TTL_SECONDS", "3600")),
+    max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+    backend=SQLiteSessionBackend(SESSION_DB_PATH) if SESSION_DB_PATH else None,
+)
+_background_tasks = []
+BOOKING_STEPS = {
+    'stype': ('brand',),
+    'brand': ('model', 'brand_manual'),
+    'brand_manual': ('model',),
+    'model': ('year', 'model_manual'),
+    'model_manual': ('year',),
+    'year': ('subtype',),
+    'subtype': ('date', 'phone'),
+    'date': ('time',),
+    'time': ('phone',),
+    'phone': (),
+}
+router = StepRouter(BOOKING_STEPS)
+keyboards = KeyboardCache(SERVICE_TYPES, POPULAR_CARS)
+CALENDAR_MIRROR_SECONDS = int(os.getenv("CALENDAR_MIRROR_SECONDS", "60"))
+mirror = CalendarMirror(
+    BOT_DB_PATH,
+    [info['calendar_id'] for info in SERVICE_TYPES.values()],
+    sync_events,
+    interval=CALENDAR_MIRROR_SECONDS or 60,
+    on_cancelled=lambda cancelled: calendar_cancelled(cancelled),
+) if CALENDAR_MIRROR_SECONDS else None
+
+def fetch_busy(calendar_ids, time_min, time_max):
+    if mirror is not None and mirror.is_fresh(calendar_ids):
+        busy = mirror.busy_between(calendar_ids, time_min, time_max)
+    else:
+        busy = query_free_busy(calendar_ids, time_min, time_max)
+    # Бронювання, яке outbox ще не доставив, у календарі не видно, але слот уже зайнятий.
+    for calendar_id, intervals in outbox.pending_busy(calendar_ids, time_min, time_max, SLOT_MINUTES).items():
+        busy.setdefault(calendar_id, []).extend(intervals)
+    return busy
+
+def load_reminders(days_ahead=0):
+    if mirror is not None and mirror.is_fresh():
+        return mirror.reminders_for_day(days_ahead)
+    return get_upcoming_events_for_reminders(days_ahead)
+
+def load_upcoming(time_min, time_max):
+    if mirror is not None and mirror.is_fresh():
+        return mirror.reminders_between(time_min, time_max)
+    return get_reminders_between(time_min, time_max)
+
+# timer — нагадування за REMINDER_OFFSETS_MINUTES до запису; daily — старі перевірки о 9:00 і 19:00.
+REMINDER_MODE = os.getenv("REMINDER_MODE", "timer")
+reminder_ledger = ReminderLedger(BOT_DB_PATH)
+reminders = ReminderScheduler(
+    load_upcoming,
+    send_reminder,
+    reminder_ledger,
+    offsets=[int(x) for x in os.getenv("REMINDER_OFFSETS_MINUTES", "1440,120").split(",") if x.strip()],
+    rescan_interval=int(os.getenv("REMINDER_RESCAN_SECONDS", "120")),
+) if REMINDER_MODE == "timer" and RUN_BACKGROUND else None
+
+def mirror_delivered(calendar_id, booking, event):
+    if mirror is not None and event:
+        mirror.apply(calendar_id, [event])
+    if reminders is not None and event and event.get('status') != 'cancelled':
+        record = reminder_from_event(event)
+        if record is not None:
+            reminders.upsert(record)
+
+availability = AvailabilityEngine(
+    fetch_busy,
+    [info['calendar_id'] for info in SERVICE_TYPES.values() if info['requires_datetime']],
+    ttl=int(os.getenv("AVAILABILITY_TTL_SECONDS", "60")),
+)
+outbox = CalendarOutbox(
+    BOT_DB_PATH,
+    add_to_calendar,
+    max_attempts=int(os.getenv("CALENDAR_OUTBOX_MAX_ATTEMPTS", "8")),
+    on_delivered=mirror_delivered,
+    get_event=get_event,
+)
+
+def calendar_cancelled(cancelled):
+    # Менеджер видалив запис у календарі: слот можна бронювати знову, нагадування не потрібні.
+    for _, event_id in cancelled:
+        outbox.cancel(event_id)
+        if reminders is not None:
+            reminders.cancel(event_id)
+notifier = ManagerNotifier(
+    MANAGER_TOKEN,
+    workers=int(os.getenv("MANAGER_NOTIFY_WORKERS", "2")),
+    per_minute=int(os.getenv("MANAGER_NOTIFY_PER_MINUTE", "20")) / BOT_SHARDS,
+    digest_threshold=int(os.getenv("MANAGER_NOTIFY_DIGEST_THRESHOLD", "3")),
+)
+THROTTLE_LIMITS = parse_limits(os.getenv("THROTTLE_LIMITS", DEFAULT_LIMITS))
+
+def throttle_key(m: types.Message):
+    text = m.text or ''
+    if text == START_BUTTON or text.startswith('/start'):
+        return 'start'
+    session = sessions.get(m.from_user.id)
+    if session is not None and session.step in THROTTLE_LIMITS:
+        return session.step
+    return 'default'
+
+throttling = ThrottlingMiddleware(
+    THROTTLE_LIMITS,
+    classify=throttle_key,
+    warn=os.getenv("THROTTLE_MODE", "warn") == "warn",
+)
+dp.middleware.setup(throttling)
+dp.middleware.setup(metrics.HandlerMetricsMiddleware())
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "data/metrics.json")
+metrics.REGISTRY.gauge("stobot_sessions", "Active booking sessions", lambda: len(sessions))
+metrics.REGISTRY.counter("stobot_throttled_total", "Messages dropped by throttling", lambda: throttling.dropped)
+metrics.REGISTRY.gauge("stobot_outbound_queued", "Sends waiting for the global rate limit", outbound.queue_depth)
+metrics.REGISTRY.gauge("stobot_manager_notify_pending", "Manager notifications not sent yet", notifier.pending_count)
+metrics.REGISTRY.gauge("stobot_calendar_outbox_pending", "Bookings waiting for Calendar",
+                       lambda: outbox.counts().get('pending', 0))
+if reminders is not None:
+    metrics.REGISTRY.gauge("stobot_reminders_scheduled", "Appointments with pending reminders", lambda: len(reminders))
+desktop = get_pusher()
+metrics.REGISTRY.gauge("stobot_desktop_push_queued", "Desktop events waiting in memory", desktop.queued)
+metrics.REGISTRY.gauge("stobot_desktop_push_spooled", "Desktop events waiting in the on-disk spool", desktop.spooled)
+metrics.REGISTRY.counter("stobot_desktop_push_dropped_total", "Desktop events dropped", lambda: desktop.dropped)
+_metrics_runner = None
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", BOT_DB_PATH)
+job_runner = JobRunner(JOBS_DB_PATH)
+job_scheduler = None
+
+async def on_startup(dp):
+    global _metrics_runner
+    notifier.start()
+    if desktop.secret:
+        desktop.start()
+    interval = int(os.getenv("SESSION_FLUSH_SECONDS", "30"))
+    _background_tasks.append(asyncio.create_task(sessions.run_maintenance(interval)))
+    if RUN_BACKGROUND:
+        # Інші шарди лише ставлять записи в outbox і читають дзеркало зі спільної БД.
+        _background_tasks.append(asyncio.create_task(outbox.run()))
+        if mirror is not None:
+            _background_tasks.append(asyncio.create_task(mirror.run()))
+        if reminders is not None:
+            _background_tasks.append(asyncio.create_task(reminders.run()))
+    _background_tasks.append(asyncio.create_task(metrics.monitor_loop_lag()))
+    if METRICS_SNAPSHOT_PATH:
+        snapshot_interval = int(os.getenv("METRICS_SNAPSHOT_SECONDS", "60"))
+        _background_tasks.append(asyncio.create_task(metrics.run_snapshots(METRICS_SNAPSHOT_PATH, snapshot_interval)))
+    if METRICS_PORT:
+        try:
+            _metrics_runner = await metrics.start_http(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            logging.error(f"❌ Metrics endpoint unavailable: {e}")
+
+async def on_shutdown(dp):
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+    if METRICS_SNAPSHOT_PATH:
+        metrics.write_snapshot(METRICS_SNAPSHOT_PATH)
+    sessions.close()
+    outbox.close()
+    if mirror is not None:
+        mirror.close()
+    reminder_ledger.close()
+    if job_scheduler is not None and job_scheduler.running:
+        job_scheduler.shutdown(wait=False)
+    job_runner.close()
+    await notifier.close()
+    await desktop.close()
 
 def notify_manager(data, full_name, chat_id):
     if not MANAGER_TOKEN or not chat_id:
@@ -41,210 +246,199 @@ def notify_manager(data, full_name, chat_id):
         f"📅 <b>Час:</b> {data.get('datetime')}\n"
         f"📱 <b>Телефон:</b> {data.get('phone')}"
     )
-    requests.post(
-        f"https://api.telegram.org/bot{MANAGER_TOKEN}/sendMessage",
-        data={"chat_id": chat_id, "text": msg, "parse_mode": "HTML"}
-    )
-
-def make_reply_keyboard(options, row_width=2, request_contact=False):
-    kb = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    for i in range(0, len(options), row_width):
-        kb.row(*options[i:i+row_width])
-    if request_contact:
-        kb.add(KeyboardButton("📱 Поділитися номером", request_contact=True))
-    return kb
+    notifier.notify(chat_id, msg)
 
 @dp.message_handler(commands=['start'])
 async def cmd_start(msg: types.Message):
     uid = msg.from_user.id
-    kb = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    kb.add(KeyboardButton("🚀 Почати"))
-    await msg.answer("Привіт! Натисни «🚀 Почати» для старту запису на сервіс.", reply_markup=kb)
-    user_data[uid] = {'step': None}
+    await msg.answer("Привіт! Натисни «🚀 Почати» для старту запису на сервіс.", reply_markup=keyboards.get('start'))
+    sessions.create(uid)
     push_to_desktop(uid, msg.from_user.full_name, msg.text or "/start", message_id=msg.message_id)
 
-@dp.message_handler(lambda m: m.text == "🚀 Почати")
+@dp.message_handler(lambda m: m.text == START_BUTTON)
 async def handle_start_button(m: types.Message):
     uid = m.from_user.id
-    user_data[uid] = {}
-    opts = list(SERVICE_TYPES.keys())
-    kb = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    for i in range(0, len(opts), 2):
-        kb.row(*opts[i:i+2])
-    await m.answer("Оберіть тип роботи:", reply_markup=kb)
-    user_data[uid]['step'] = 'stype'
+    session = sessions.create(uid)
+    await m.answer("Оберіть тип роботи:", reply_markup=keyboards.get('stype'))
+    session.step = 'stype'
 
+@dp.message_handler(content_types=types.ContentType.TEXT)
+async def route_step(m: types.Message):
+    session = sessions.get(m.from_user.id)
+    if session is not None:
+        await router.dispatch(session, m)
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'stype')
-async def step_stype(m: types.Message):
-    uid = m.from_user.id
+
+@router.step('stype')
+async def step_stype(m: types.Message, session):
     stype = m.text.strip()
     if stype not in SERVICE_TYPES:
         await m.answer("❗ Оберіть правильний варіант із клавіатури.")
         return
-    user_data[uid]['service_type'] = stype
-    user_data[uid]['step'] = 'brand'
-    opts = list(POPULAR_CARS.keys()) + ["✏️ Інша марка"]
-    kb = make_reply_keyboard(opts, row_width=2)
-    await m.answer(f"Тип: {stype}\nОберіть марку авто:", reply_markup=kb)
-
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'brand')
-async def step_brand(m: types.Message):
-    uid = m.from_user.id
+    session.update(service_type=stype, step='brand')
+    await m.answer(f"Тип: {stype}\nОберіть марку авто:", reply_markup=keyboards.get('brand'))
+
+@router.step('brand')
+async def step_brand(m: types.Message, session):
     text = m.text.strip()
-    if text == "✏️ Інша марка":
-        user_data[uid]['awaiting_brand'] = True
-        await m.answer("Введіть марку вручну:", reply_markup=types.ReplyKeyboardRemove())
+    if text == OTHER_BRAND:
+        session.step = 'brand_manual'
+        await m.answer("Введіть марку вручну:", reply_markup=keyboards.get('remove'))
         return
     if text not in POPULAR_CARS:
         await m.answer("❗ Оберіть марку з клавіатури або '✏️ Інша марка'.")
         return
-    user_data[uid].update({'brand': text, 'step': 'model'})
-    opts = POPULAR_CARS[text] + ["✏️ Інша модель"]
-    kb = make_reply_keyboard(opts, row_width=2)
-    await m.answer(f"Марка: {text}\nОберіть модель:", reply_markup=kb)
+    session.update(brand=text, step='model')
+    await m.answer(f"Марка: {text}\nОберіть модель:", reply_markup=keyboards.get('model', brand=text))
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('awaiting_brand'))
-async def manual_brand(m: types.Message):
-    uid = m.from_user.id
-    user_data[uid].update({'brand': m.text.strip(), 'awaiting_brand': False, 'step': 'model'})
-    opts = ["✏️ Інша модель"]
-    kb = make_reply_keyboard(opts)
-    await m.answer(f"Марка: {m.text}\nОберіть модель:", reply_markup=kb)
+@router.step('brand_manual')
+async def manual_brand(m: types.Message, session):
+    session.update(brand=m.text.strip(), step='model')
+    await m.answer(f"Марка: {m.text}\nОберіть модель:", reply_markup=keyboards.get('model'))
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'model')
-async def step_model(m: types.Message):
-    uid = m.from_user.id
+@router.step('model')
+async def step_model(m: types.Message, session):
     text = m.text.strip()
-    if text == "✏️ Інша модель":
-        user_data[uid]['awaiting_model'] = True
-        await m.answer("Введіть модель вручну:", reply_markup=types.ReplyKeyboardRemove())
+    if text == OTHER_MODEL:
+        session.step = 'model_manual'
+        await m.answer("Введіть модель вручну:", reply_markup=keyboards.get('remove'))
         return
-    user_data[uid].update({'car': f"{user_data[uid]['brand']} {text}", 'step': 'year'})
-    years = [str(y) for y in range(datetime.now().year, 1995, -1)]
-    kb = make_reply_keyboard(years, row_width=3)
-    await m.answer(f"Модель: {text}\nОберіть рік:", reply_markup=kb)
+    session.update(car=f"{session.brand} {text}", step='year')
+    await m.answer(f"Модель: {text}\nОберіть рік:", reply_markup=keyboards.get('year'))
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('awaiting_model'))
-async def manual_model(m: types.Message):
-    uid = m.from_user.id
-    car = f"{user_data[uid]['brand']} {m.text.strip()}"
-    user_data[uid].update({'car': car, 'awaiting_model': False, 'step': 'year'})
-    years = [str(y) for y in range(datetime.now().year, 1995, -1)]
-    kb = make_reply_keyboard(years, row_width=3)
-    await m.answer(f"Модель: {m.text}\nОберіть рік:", reply_markup=kb)
-
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'year')
-async def step_year(m: types.Message):
-    uid = m.from_user.id
+@router.step('model_manual')
+async def manual_model(m: types.Message, session):
+    car = f"{session.brand} {m.text.strip()}"
+    session.update(car=car, step='year')
+    await m.answer(f"Модель: {m.text}\nОберіть рік:", reply_markup=keyboards.get('year'))
+
+@router.step('year')
+async def step_year(m: types.Message, session):
     year = m.text.strip()
     if not year.isdigit():
         await m.answer("❗ Оберіть рік з кнопок.")
         return
-    user_data[uid]['car'] += f" ({year})"
-    user_data[uid].update({'year': year, 'step': 'subtype'})
-    st = user_data[uid]['service_type']
-    subs = SERVICE_TYPES[st]['subtypes']
-    kb = make_reply_keyboard(subs, row_width=2)
-    await m.answer(f"Авто: {user_data[uid]['car']}\nОберіть підтип:", reply_markup=kb)
-
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'subtype')
-async def step_subtype(m: types.Message):
-    uid = m.from_user.id
+    session.update(car=f"{session.car} ({year})", year=year, step='subtype')
+    kb = keyboards.get('subtype', service_type=session.service_type)
+    await m.answer(f"Авто: {session.car}\nОберіть підтип:", reply_markup=kb)
+
+@router.step('subtype')
+async def step_subtype(m: types.Message, session):
     subtype = m.text.strip()
-    st = user_data[uid]['service_type']
+    st = session.service_type
     if subtype not in SERVICE_TYPES[st]['subtypes']:
         await m.answer("❗ Оберіть підтип з кнопок.")
         return
-    user_data[uid].update({'subtype': subtype})
+    session.subtype = subtype
     if SERVICE_TYPES[st]['requires_datetime']:
-        user_data[uid]['step'] = 'date'
-        now = datetime.utcnow() + timedelta(hours=3)
-        dates = []
-        for i in range(14):
-            d = now.date() + timedelta(days=i)
-            if i == 0 and now.hour >= 17: continue
-            dates.append(d.strftime("%Y-%m-%d"))
-        kb = make_reply_keyboard(dates, row_width=3)
+        session.step = 'date'
+        calendar_id = SERVICE_TYPES[st]['calendar_id']
+        dates = await availability.free_dates(calendar_id, booking_dates(kyiv_now()))
+        kb = keyboards.get('date', service_type=st, options=dates)
         await m.answer("Оберіть дату (YYYY-MM-DD):", reply_markup=kb)
     else:
-        user_data[uid].update({'datetime': 'без дати', 'step': 'phone'})
-        kb = make_reply_keyboard([], request_contact=True)
-        await m.answer("Поділіться номером:", reply_markup=kb)
+        session.update(datetime='без дати', step='phone')
+        await m.answer("Поділіться номером:", reply_markup=keyboards.get('phone'))
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'date')
-async def step_date(m: types.Message):
-    uid = m.from_user.id
+@router.step('date')
+async def step_date(m: types.Message, session):
     date = m.text.strip()
-    try:
-        datetime.fromisoformat(date)
-    except:
+    if date not in booking_dates(kyiv_now()):
         await m.answer("❗ Введіть дату у форматі YYYY-MM-DD кнопками.")
         return
-    user_data[uid].update({'selected_date': date, 'step': 'time'})
-    wd = datetime.fromisoformat(date).weekday()
-    start, end = ("09:00","13:00") if wd==5 else ("09:00","17:30")
-    times = []
-    t = datetime.fromisoformat(f"{date}T{start}")
-    et = datetime.fromisoformat(f"{date}T{end}")
-    now = datetime.utcnow() + timedelta(hours=3)
-    while t <= et:
-        if not (t.date()==now.date() and t<=now):
-            times.append(t.strftime("%H:%M"))
-        t += timedelta(minutes=30)
-    kb = make_reply_keyboard(times, row_width=3)
+    st = session.service_type
+    times = await availability.free_times(SERVICE_TYPES[st]['calendar_id'], date)
+    if not times:
+        await m.answer("❗ На цю дату немає вільного часу, оберіть іншу.")
+        return
+    session.update(selected_date=date, step='time')
+    kb = keyboards.get('time', service_type=st, date=date, options=times)
     await m.answer("Оберіть час:", reply_markup=kb)
 
-@dp.message_handler(lambda m: user_data.get(m.from_user.id, {}).get('step') == 'time')
-async def step_time(m: types.Message):
-    uid = m.from_user.id
+@router.step('time')
+async def step_time(m: types.Message, session):
     time = m.text.strip()
-    user_data[uid].update({'datetime': f"{user_data[uid]['selected_date']} {time}", 'step': 'phone'})
-    kb = make_reply_keyboard([], request_contact=True)
-    await m.answer("Поділіться номером:", reply_markup=kb)
+    st = session.service_type
+    date = session.selected_date
+    times = await availability.free_times(SERVICE_TYPES[st]['calendar_id'], date)
+    if time not in times:
+        kb = keyboards.get('time', service_type=st, date=date, options=times)
+        await m.answer("❗ Цей час недоступний, оберіть інший з кнопок.", reply_markup=kb)
+        return
+    session.update(datetime=f"{date} {time}", step='phone')
+    await m.answer("Поділіться номером:", reply_markup=keyboards.get('phone'))
 
 @dp.message_handler(content_types=types.ContentType.CONTACT)
 async def step_contact(m: types.Message):
     uid = m.from_user.id
-    data = user_data.get(uid, {})
-    if data.get('step') != 'phone':
+    data = sessions.get(uid)
+    if data is None or data.step != 'phone':
         return
 
-    data['phone'] = m.contact.phone_number
-    stype = data['service_type']
+    data.phone = m.contact.phone_number
+    stype = data.service_type
     calendar_id = SERVICE_TYPES[stype]['calendar_id']
     chat_id = SERVICE_TYPES[stype]['chat_id']
 
-    # ➕ Лише якщо дата є — додаємо в календар
-    if data.get('datetime') and data['datetime'] != 'без дати':
+    # ➕ Лише якщо дата є — ставимо в чергу на календар (запис спершу зберігається локально)
+    if data.datetime and data.datetime != 'без дати':
         try:
-            add_to_calendar(
-                summary=f"{stype} — {data['car']}",
-                description=f"Телефон: {data['phone']}, Ім’я: {m.from_user.full_name}",
-                start_str=data['datetime'],
-                service_type=f"{stype} - {data['subtype']}",
-                calendar_id=calendar_id,
-                user_id=uid,
-                chat_id=str(uid),
-                full_name=m.from_user.full_name,
-                phone=data['phone'],
-                car=data['car']
-            )
+            outbox.enqueue(calendar_id, {
+                'summary': f"{stype} — {data.car}",
+                'description': f"Телефон: {data.phone}, Ім’я: {m.from_user.full_name}",
+                'start_str': data.datetime,
+                'service_type': f"{stype} - {data.subtype}",
+                'user_id': uid,
+                'chat_id': str(uid),
+                'full_name': m.from_user.full_name,
+                'phone': data.phone,
+                'car': data.car,
+            })
+            start = datetime.strptime(data.datetime, '%Y-%m-%d %H:%M')
+            availability.add_busy(calendar_id, start, start + timedelta(minutes=SLOT_MINUTES))
         except Exception as e:
-            logging.error(f"❌ Calendar error: {e}")
+            logging.error(f"❌ Calendar outbox error: {e}")
 
     # 🟢 У будь-якому випадку — надсилаємо менеджеру
     try:
-        notify_manager(data, m.from_user.full_name, chat_id)
+        notify_manager(data.to_dict(), m.from_user.full_name, chat_id)
     except Exception as e:
         logging.error(f"❌ Notify error: {e}")
 
-    await m.answer("✅ Заявка прийнята!", reply_markup=types.ReplyKeyboardRemove())
+    await m.answer("✅ Заявка прийнята!", reply_markup=keyboards.get('remove'))
     push_to_desktop(uid, m.from_user.full_name, "Нова заявка створена", message_id=m.message_id)
-    user_data.pop(uid, None)
+    sessions.pop(uid)
+
+@job_runner.exclusive()
+async def reminders_today():
+    return await run_daily_check(0, load_reminders, reminder_ledger)
+
+@job_runner.exclusive()
+async def reminders_tomorrow():
+    return await run_daily_check(1, load_reminders, reminder_ledger)
+
+@job_runner.exclusive()
+async def purge_reminder_ledger():
+    reminder_ledger.purge()
 
 def schedule_jobs():
-    scheduler = AsyncIOScheduler(timezone="Europe/Kiev")
-    scheduler.add_job(lambda: run_daily_check(0), "cron", hour=9, minute=0)
-    scheduler.add_job(lambda: run_daily_check(1), "cron", hour=19, minute=0)
-    scheduler.start()
+    # Задачі живуть у SQLite: запуск, що випав на рестарт, виконається після старту (в межах misfire grace).
+    global job_scheduler
+    jitter = int(os.getenv("JOB_JITTER_SECONDS", "30"))
+    job_scheduler = create_scheduler(
+        JOBS_DB_PATH,
+        misfire_grace_time=int(os.getenv("JOB_MISFIRE_GRACE_SECONDS", "3600")),
+    )
+    job_scheduler.start()
+    jobs = [
+        ('purge_reminder_ledger', purge_reminder_ledger,
+         CronTrigger(hour=3, minute=30, jitter=jitter, timezone="Europe/Kiev")),
+    ]
+    if REMINDER_MODE == "daily":
+        jobs += [
+            ('reminders_today', reminders_today, CronTrigger(hour=9, minute=0, jitter=jitter, timezone="Europe/Kiev")),
+            ('reminders_tomorrow', reminders_tomorrow,
+             CronTrigger(hour=19, minute=0, jitter=jitter, timezone="Europe/Kiev")),
+        ]
+    ensure_jobs(job_scheduler, jobs)
+    return job_scheduler
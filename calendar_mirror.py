@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+KYIV = ZoneInfo('Europe/Kiev')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_mirror (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    summary TEXT,
+    transparent INTEGER NOT NULL DEFAULT 0,
+    private TEXT,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_mirror_start ON calendar_mirror(calendar_id, start);
+CREATE TABLE IF NOT EXISTS calendar_sync (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _http_status(exc):
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+def _local_time(value):
+    # Час зберігається як наївний київський ISO-рядок, тож порівняння рядків = порівняння часу.
+    if 'dateTime' in value:
+        moment = datetime.fromisoformat(value['dateTime']).astimezone(KYIV).replace(tzinfo=None)
+        return moment.isoformat(timespec='seconds')
+    return f"{value['date']}T00:00:00"
+
+
+class CalendarMirror:
+    def __init__(self, path, calendar_ids, fetch_changes, interval=60, history_days=1, on_cancelled=None):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.calendar_ids = sorted(set(calendar_ids))
+        self.fetch_changes = fetch_changes
+        self.interval = interval
+        self.history_days = history_days
+        # Викликається в потоці циклу подій зі списком (calendar_id, event_id) скасованих подій.
+        self.on_cancelled = on_cancelled
+        self._cancelled = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _sync_state(self, calendar_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM calendar_sync WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return (row["sync_token"], row["synced_at"]) if row else (None, None)
+
+    def sync(self, calendar_id):
+        token, _ = self._sync_state(calendar_id)
+        full = token is None
+        try:
+            events, next_token = self._fetch(calendar_id, token)
+        except Exception as e:
+            if token is None or _http_status(e) != 410:
+                raise
+            logging.warning(f"⚠️ Sync token для {calendar_id} протух — повна синхронізація")
+            full = True
+            events, next_token = self._fetch(calendar_id, None)
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM calendar_mirror WHERE calendar_id = ?", (calendar_id,))
+            cancelled = self._apply(calendar_id, events)
+            self._cancelled.extend((calendar_id, event_id) for event_id in cancelled)
+            # Інкрементальна синхронізація не видаляє минулі події — обрізаємо їх тим самим вікном history_days.
+            self._conn.execute(
+                "DELETE FROM calendar_mirror WHERE calendar_id = ? AND end < ?",
+                (calendar_id, self._history_start().isoformat(timespec='seconds')),
+            )
+            self._conn.execute(
+                """
+                INSERT INTO calendar_sync(calendar_id, sync_token, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(calendar_id) DO UPDATE SET sync_token=excluded.sync_token, synced_at=excluded.synced_at
+                """,
+                (calendar_id, next_token, time.time()),
+            )
+        return len(events)
+
+    def _history_start(self):
+        return datetime.now(KYIV).replace(tzinfo=None) - timedelta(days=self.history_days)
+
+    def _fetch(self, calendar_id, token):
+        return self.fetch_changes(calendar_id, sync_token=token, time_min=self._history_start())
+
+    def _apply(self, calendar_id, events):
+        cancelled = []
+        for event in events:
+            if event.get('status') == 'cancelled':
+                self._conn.execute(
+                    "DELETE FROM calendar_mirror WHERE calendar_id = ? AND event_id = ?", (calendar_id, event['id'])
+                )
+                cancelled.append(event['id'])
+                continue
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO calendar_mirror(calendar_id, event_id, start, end, summary, transparent, private)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    calendar_id, event['id'], _local_time(event['start']), _local_time(event['end']),
+                    event.get('summary', ''), int(event.get('transparency') == 'transparent'),
+                    json.dumps(event.get('extendedProperties', {}).get('private', {}), ensure_ascii=False),
+                ),
+            )
+        return cancelled
+
+    def apply(self, calendar_id, events):
+        # Свіжостворені події з outbox видно одразу, не чекаючи наступної синхронізації.
+        with self._lock, self._conn:
+            self._apply(calendar_id, events)
+
+    def sync_all(self):
+        for calendar_id in self.calendar_ids:
+            try:
+                self.sync(calendar_id)
+            except Exception as e:
+                logging.error(f"❌ Calendar mirror sync error ({calendar_id}): {e}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sync_all)
+            with self._lock:
+                cancelled, self._cancelled = self._cancelled, []
+            if cancelled and self.on_cancelled:
+                try:
+                    self.on_cancelled(cancelled)
+                except Exception as e:
+                    logging.error(f"❌ Calendar mirror cancel hook error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def is_fresh(self, calendar_ids=None, max_age=None):
+        max_age = max_age or 3 * self.interval
+        for calendar_id in calendar_ids or self.calendar_ids:
+            _, synced_at = self._sync_state(calendar_id)
+            if synced_at is None or time.time() - synced_at > max_age:
+                return False
+        return True
+
+    def events_between(self, calendar_id, start, end):
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM calendar_mirror
+                WHERE calendar_id = ? AND start < ? AND end > ?
+                ORDER BY start
+                """,
+                (calendar_id, end.isoformat(timespec='seconds'), start.isoformat(timespec='seconds')),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def busy_between(self, calendar_ids, time_min, time_max):
+        # Та сама форма, що й у google_calendar.query_free_busy — годиться для AvailabilityEngine.
+        return {
+            calendar_id: [
+                (datetime.fromisoformat(row['start']), datetime.fromisoformat(row['end']))
+                for row in self.events_between(calendar_id, time_min, time_max)
+                if not row['transparent']
+            ]
+            for calendar_id in calendar_ids
+        }
+
+    def reminders_for_day(self, days_ahead=0):
+        now = datetime.now(KYIV).replace(tzinfo=None)
+        start_of_day = (now + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.reminders_between(start_of_day, start_of_day + timedelta(days=1))
+
+    def reminders_between(self, time_min, time_max):
+        reminders = []
+        for calendar_id in self.calendar_ids:
+            for row in self.events_between(calendar_id, time_min, time_max):
+                if row['start'] < time_min.isoformat(timespec='seconds'):
+                    continue
+                ep = json.loads(row['private'] or '{}')
+                if not (ep.get('user_id') and ep.get('chat_id')):
+                    continue
+                try:
+                    user_id, chat_id = int(ep['user_id']), int(ep['chat_id'])
+                except ValueError as e:
+                    logging.warning(f"⚠️ Пропущено {row['event_id']}: некоректні дані події ({e})")
+                    continue
+                reminders.append({
+                    'event_id': row['event_id'],
+                    'user_id': user_id,
+                    'chat_id': chat_id,
+                    'full_name': ep.get('full_name', ''),
+                    'phone': ep.get('phone', ''),
+                    'datetime': row['start'],
+                    'car': ep.get('car', ''),
+                    'service_type': ep.get('service_type', ''),
+                })
+        return reminders
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -2,10 +2,12 @@ import json
 import logging
 import os
 import sys
+import threading
 from datetime import datetime, timedelta
 
-from PySide6.QtCore import Qt, Signal, QObject
+from PySide6.QtCore import Qt, Signal, QObject, QTimer
 from PySide6.QtWidgets import (
+    QAbstractItemView,
     QApplication,
     QComboBox,
     QDateTimeEdit,
@@ -14,8 +16,8 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QListView,
     QListWidget,
-    QListWidgetItem,
     QMainWindow,
     QMessageBox,
     QPushButton,
@@ -30,17 +32,28 @@ from PySide6.QtWidgets import (
     QFileDialog,
 )
 
-from calendar_api import create_event, has_conflict, list_events, test_access
+from calendar_api import create_event, has_conflict, list_events, sync_events, test_access
+from calendar_mirror import CalendarMirror
+from chat_list_model import ChatListModel
 from config_store import AppConfig
+from ingest_bus import IngestBus
 from local_api import LocalAPIServer
 from storage import Database
 from telegram_api import send_message, test_token
+from write_queue import WriteQueue
+
+
+HISTORY_PAGE_SIZE = 50
 
 
 class LogEmitter(QObject):
     message = Signal(str)
 
 
+class SyncEmitter(QObject):
+    synced = Signal()
+
+
 class QtLogHandler(logging.Handler):
     def __init__(self, emitter: LogEmitter):
         super().__init__()
@@ -104,6 +117,17 @@ class MainWindow(QMainWindow):
 
         self.config = AppConfig.load(self.config_path)
         self.db = Database(self.db_path)
+        self.write_queue = WriteQueue(self.db)
+        self.ingest_bus = IngestBus(parent=self)
+        self.ingest_bus.flushed.connect(self._apply_incoming)
+        self.calendar_mirror = CalendarMirror(
+            os.path.join(self.data_dir, "calendar_mirror.db"),
+            lambda calendar_id, token, time_min: sync_events(
+                self.config.google_creds_path, calendar_id, token, time_min
+            ),
+        )
+        self._calendar_sync_thread = None
+        self.sync_emitter = SyncEmitter()
 
         self.log_emitter = LogEmitter()
         self.log_emitter.message.connect(self._append_log)
@@ -113,8 +137,13 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.tabs)
 
         self.chat_tabs = QTabWidget()
-        self.chat_list = QListWidget()
+        self.chat_model = ChatListModel(self)
+        self.chat_list = QListView()
+        self.chat_list.setModel(self.chat_model)
+        self.chat_list.setUniformItemSizes(True)
         self.messages_by_chat = {}
+        self.history_cursors = {}
+        self.history_exhausted = set()
 
         self.calendar_tab = QWidget()
         self.settings_tab = QWidget()
@@ -129,11 +158,18 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.calendar_tab, "Календар")
         self.tabs.addTab(self.settings_tab, "Налаштування")
         self.tabs.addTab(self.logs_tab, "Логи/Помилки")
+        self.tabs.currentChanged.connect(self._mark_focused_read)
 
         self._load_chats()
         self._validate_config(initial=True)
         self._start_api_server()
 
+        self.sync_emitter.synced.connect(self._load_calendar_events)
+        self.calendar_sync_timer = QTimer(self)
+        self.calendar_sync_timer.timeout.connect(self._sync_calendars)
+        self.calendar_sync_timer.start(max(10, self.config.calendar_sync_seconds) * 1000)
+        self._sync_calendars()
+
     def _setup_logging(self):
         log_path = os.path.join(self.logs_dir, "app.log")
         logging.basicConfig(
@@ -153,7 +189,8 @@ class MainWindow(QMainWindow):
         splitter.addWidget(self.chat_tabs)
         splitter.setStretchFactor(1, 3)
         layout.addWidget(splitter)
-        self.chat_list.itemClicked.connect(self._open_chat_tab)
+        self.chat_list.clicked.connect(self._open_chat_tab)
+        self.chat_tabs.currentChanged.connect(self._mark_focused_read)
 
     def _build_calendar_tab(self):
         layout = QVBoxLayout(self.calendar_tab)
@@ -281,12 +318,14 @@ class MainWindow(QMainWindow):
             local_api_port=port,
             google_creds_path=self.creds_input.text().strip(),
             service_calendar_mapping=mapping,
+            calendar_sync_seconds=self.config.calendar_sync_seconds,
         )
         self.config.save(self.config_path)
         QMessageBox.information(self, "Config", "Збережено")
         self._validate_config()
         self._load_calendar_filters()
         self._restart_api_server()
+        self._sync_calendars()
 
     def _validate_config(self, initial=False):
         missing = self.config.validate()
@@ -318,7 +357,11 @@ class MainWindow(QMainWindow):
         if not self.config.shared_secret:
             return
         self.api_server = LocalAPIServer(
-            "127.0.0.1", self.config.local_api_port, self.config.shared_secret, self._handle_incoming
+            "127.0.0.1",
+            self.config.local_api_port,
+            self.config.shared_secret,
+            self._handle_incoming,
+            self._handle_incoming_batch,
         )
         self.api_server.start()
 
@@ -327,29 +370,65 @@ class MainWindow(QMainWindow):
             self.api_server.stop()
         self._start_api_server()
 
+    def closeEvent(self, event):
+        if getattr(self, "api_server", None):
+            self.api_server.stop()
+        self.write_queue.close()
+        logging.info("Ingest bus: %s", self.ingest_bus.stats())
+        self.db.close()
+        super().closeEvent(event)
+
+    @staticmethod
+    def _incoming_row(payload: dict):
+        return (
+            str(payload.get("chat_id")),
+            payload.get("user_name", "Unknown"),
+            payload.get("text", ""),
+            payload.get("ts", datetime.utcnow().isoformat()),
+            json.dumps(payload),
+        )
+
     def _handle_incoming(self, payload: dict):
-        chat_id = str(payload.get("chat_id"))
-        user_name = payload.get("user_name", "Unknown")
-        text = payload.get("text", "")
-        ts = payload.get("ts", datetime.utcnow().isoformat())
-        self.db.upsert_chat(chat_id, user_name)
-        self.db.add_message(chat_id, "in", text, ts, "sent", json.dumps(payload))
-        self._refresh_chat_list()
-        self._append_message_to_ui(chat_id, f"{user_name}: {text}")
+        self._handle_incoming_batch([payload])
+
+    def _handle_incoming_batch(self, payloads):
+        # Runs on a local API worker thread: no widget access here, the bus hands updates to the GUI thread.
+        rows = [self._incoming_row(payload) for payload in payloads]
+        # Wait for the group commit: the bot only drops an event after a 200.
+        self.write_queue.submit_many(rows).result()
+        self.ingest_bus.publish(rows)
+
+    def _apply_incoming(self, updates):
+        focused = self._focused_chat_id()
+        for update in updates:
+            unread_delta = update.unread_delta
+            if update.chat_id == focused and unread_delta:
+                # The chat is on screen: its messages are read as they arrive.
+                self.db.mark_chat_read(update.chat_id)
+                unread_delta = 0
+            self.chat_model.upsert(update.chat_id, update.display_name, update.last_message_at, unread_delta)
+            messages = self.messages_by_chat.get(update.chat_id)
+            if messages is not None and update.lines:
+                messages.addItems(update.lines)
+
+    def _focused_chat_id(self):
+        if self.tabs.currentWidget() is not self.chat_container or self.chat_tabs.count() == 0:
+            return None
+        return self.chat_tabs.tabText(self.chat_tabs.currentIndex())
+
+    def _mark_focused_read(self, *_):
+        chat_id = self._focused_chat_id()
+        if chat_id:
+            self.db.mark_chat_read(chat_id)
+            self.chat_model.mark_read(chat_id)
 
     def _load_chats(self):
-        self._refresh_chat_list()
-
-    def _refresh_chat_list(self):
-        self.chat_list.clear()
-        for chat_id, display_name, last_message, _ in self.db.get_chats():
-            label = f"{display_name} ({chat_id})" if display_name else chat_id
-            item = QListWidgetItem(label)
-            item.setData(Qt.UserRole, chat_id)
-            self.chat_list.addItem(item)
-
-    def _open_chat_tab(self, item: QListWidgetItem):
-        chat_id = item.data(Qt.UserRole)
+        self.chat_model.load(self.db.get_chats())
+
+    def _open_chat_tab(self, index):
+        chat_id = index.data(ChatListModel.ChatIdRole)
+        self.db.mark_chat_read(chat_id)
+        self.chat_model.mark_read(chat_id)
         for idx in range(self.chat_tabs.count()):
             if self.chat_tabs.tabText(idx) == chat_id:
                 self.chat_tabs.setCurrentIndex(idx)
@@ -376,15 +455,42 @@ class MainWindow(QMainWindow):
         self.chat_tabs.setCurrentWidget(tab)
 
         self.messages_by_chat[chat_id] = messages
-        for direction, text, ts, status in self.db.get_messages(chat_id):
-            prefix = "You" if direction == "out" else "Client"
-            messages.addItem(f"{ts} {prefix}: {text} ({status})")
+        self.history_cursors[chat_id] = None
+        self.history_exhausted.discard(chat_id)
+        self._load_older_messages(chat_id)
+        messages.scrollToBottom()
+        messages.verticalScrollBar().valueChanged.connect(
+            lambda value: self._on_history_scrolled(chat_id, value)
+        )
         self._update_action_state()
 
-    def _append_message_to_ui(self, chat_id: str, text: str):
+    @staticmethod
+    def _format_history_row(direction: str, text: str, ts: str, status: str) -> str:
+        prefix = "You" if direction == "out" else "Client"
+        return f"{ts} {prefix}: {text} ({status})"
+
+    def _on_history_scrolled(self, chat_id: str, value: int):
         messages = self.messages_by_chat.get(chat_id)
-        if messages:
-            messages.addItem(text)
+        if messages is not None and value == messages.verticalScrollBar().minimum():
+            self._load_older_messages(chat_id)
+
+    def _load_older_messages(self, chat_id: str):
+        # The cursor is the (ts, id) of the oldest row shown; a short page means the start of the chat.
+        if chat_id in self.history_exhausted:
+            return
+        messages = self.messages_by_chat[chat_id]
+        rows = self.db.get_messages_page(chat_id, before=self.history_cursors.get(chat_id), limit=HISTORY_PAGE_SIZE)
+        if len(rows) < HISTORY_PAGE_SIZE:
+            self.history_exhausted.add(chat_id)
+        if not rows:
+            return
+        self.history_cursors[chat_id] = (rows[0][3], rows[0][0])
+        anchor = messages.item(0)
+        for row_index, (_, direction, text, ts, status) in enumerate(rows):
+            messages.insertItem(row_index, self._format_history_row(direction, text, ts, status))
+        if anchor is not None:
+            # Keep the row the user was looking at in place instead of jumping to the new top.
+            messages.scrollToItem(anchor, QAbstractItemView.PositionAtTop)
 
     def _send_chat_message(self, chat_id: str, input_line: QLineEdit, messages: QListWidget):
         if not self.config_valid:
@@ -397,6 +503,7 @@ class MainWindow(QMainWindow):
         status = "sent" if success else "failed"
         ts = datetime.utcnow().isoformat()
         self.db.add_message(chat_id, "out", text, ts, status, info)
+        self.chat_model.upsert(chat_id, "", ts, 0)
         messages.addItem(f"{ts} You: {text} ({status})")
         if not success:
             logging.error("Send failed: %s", info)
@@ -414,7 +521,7 @@ class MainWindow(QMainWindow):
         if dialog.exec() != QDialog.Accepted:
             return
         start, end, calendar_id, duration = dialog.get_values()
-        if has_conflict(self.config.google_creds_path, calendar_id, start, end):
+        if self._calendar_busy(calendar_id, start, end):
             QMessageBox.warning(self, "Calendar", "Час зайнятий")
             return
         event_id = create_event(
@@ -430,7 +537,33 @@ class MainWindow(QMainWindow):
         if not success:
             logging.error("Send confirmation failed: %s", info)
         QMessageBox.information(self, "Calendar", "Подію створено")
-        self._load_calendar_events()
+        self._sync_calendars()
+
+    def _mapped_calendar_ids(self):
+        return sorted({m.get("calendar_id") for m in self.config.service_calendar_mapping if m.get("calendar_id")})
+
+    def _sync_calendars(self):
+        if not self.config_valid:
+            return
+        if self._calendar_sync_thread and self._calendar_sync_thread.is_alive():
+            return
+        calendar_ids = self._mapped_calendar_ids()
+
+        def run():
+            self.calendar_mirror.sync_all(calendar_ids)
+            self.sync_emitter.synced.emit()
+
+        self._calendar_sync_thread = threading.Thread(target=run, daemon=True)
+        self._calendar_sync_thread.start()
+
+    def _calendar_busy(self, calendar_id, start, end):
+        # An incremental sync is one short request; without it the mirror can be a minute stale.
+        try:
+            self.calendar_mirror.sync(calendar_id)
+            return self.calendar_mirror.has_conflict(calendar_id, start, end)
+        except Exception as exc:
+            logging.warning("Calendar mirror unavailable, asking Google directly: %s", exc)
+            return has_conflict(self.config.google_creds_path, calendar_id, start, end)
 
     def _load_calendar_filters(self):
         self.calendar_filter.clear()
@@ -452,11 +585,18 @@ class MainWindow(QMainWindow):
         else:
             start = now.replace(hour=0, minute=0, second=0, microsecond=0)
             end = start + timedelta(days=7)
-        events = list_events(self.config.google_creds_path, calendar_id, start, end)
+        max_age = 3 * max(10, self.config.calendar_sync_seconds)
+        if self.calendar_mirror.is_fresh(calendar_id, max_age):
+            rows = self.calendar_mirror.events_between(calendar_id, start, end)
+            items = [(row["start_raw"], row["summary"] or "(no title)") for row in rows]
+        else:
+            events = list_events(self.config.google_creds_path, calendar_id, start, end)
+            items = [
+                (event.get("start", {}).get("dateTime", ""), event.get("summary", "(no title)"))
+                for event in events
+            ]
         self.calendar_events_list.clear()
-        for event in events:
-            summary = event.get("summary", "(no title)")
-            start_time = event.get("start", {}).get("dateTime", "")
+        for start_time, summary in items:
             self.calendar_events_list.addItem(f"{start_time} - {summary}")
 
     def _test_telegram(self):
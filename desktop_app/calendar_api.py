@@ -1,16 +1,30 @@
 import logging
+import threading
 from datetime import datetime, timedelta
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+SYNC_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,summary,transparency,start(dateTime,date),end(dateTime,date))"
+)
+
+_local = threading.local()
 
 
 def get_service(creds_path: str):
-    credentials = service_account.Credentials.from_service_account_file(
-        creds_path, scopes=SCOPES
-    )
-    return build("calendar", "v3", credentials=credentials)
+    # One client per thread: the mirror syncs in a background thread, everything else runs in the UI.
+    cache = getattr(_local, "services", None)
+    if cache is None:
+        cache = _local.services = {}
+    service = cache.get(creds_path)
+    if service is None:
+        credentials = service_account.Credentials.from_service_account_file(
+            creds_path, scopes=SCOPES
+        )
+        service = cache[creds_path] = build("calendar", "v3", credentials=credentials, static_discovery=True)
+    return service
 
 
 def list_events(creds_path: str, calendar_id: str, start_dt: datetime, end_dt: datetime):
@@ -29,6 +43,30 @@ def list_events(creds_path: str, calendar_id: str, start_dt: datetime, end_dt: d
     return events.get("items", [])
 
 
+def sync_events(creds_path: str, calendar_id: str, sync_token: str = None, time_min: datetime = None):
+    # Full sync from time_min (UTC) without a token, changes only with one; HttpError 410 once it expires.
+    service = get_service(creds_path)
+    events = []
+    page_token = None
+    while True:
+        params = {
+            "calendarId": calendar_id,
+            "singleEvents": True,
+            "maxResults": 250,
+            "pageToken": page_token,
+            "fields": SYNC_FIELDS,
+        }
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            params["timeMin"] = time_min.isoformat() + "Z"
+        result = service.events().list(**params).execute()
+        events.extend(result.get("items", []))
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return events, result.get("nextSyncToken")
+
+
 def has_conflict(creds_path: str, calendar_id: str, start_dt: datetime, end_dt: datetime):
     events = list_events(creds_path, calendar_id, start_dt, end_dt)
     return len(events) > 0
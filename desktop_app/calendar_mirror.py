@@ -0,0 +1,129 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_mirror (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    start_utc TEXT NOT NULL,
+    end_utc TEXT NOT NULL,
+    start_raw TEXT,
+    summary TEXT,
+    transparent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_mirror_start ON calendar_mirror(calendar_id, start_utc);
+CREATE TABLE IF NOT EXISTS calendar_sync (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _utc(value: dict) -> str:
+    if "dateTime" in value:
+        moment = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        return moment.astimezone(timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+    return f"{value['date']}T00:00:00"
+
+
+class CalendarMirror:
+    # Mapped calendars kept current with sync tokens; times are naive UTC ISO strings.
+    def __init__(self, db_path: str, fetch_changes, history_days: int = 1):
+        self.fetch_changes = fetch_changes
+        self.history_days = history_days
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _state(self, calendar_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM calendar_sync WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return (row["sync_token"], row["synced_at"]) if row else (None, None)
+
+    def sync(self, calendar_id: str) -> int:
+        token, _ = self._state(calendar_id)
+        time_min = datetime.utcnow() - timedelta(days=self.history_days)
+        full = token is None
+        try:
+            events, next_token = self.fetch_changes(calendar_id, token, time_min)
+        except Exception as exc:
+            if token is None or getattr(getattr(exc, "resp", None), "status", None) != 410:
+                raise
+            logging.warning("Sync token expired for %s, running full sync", calendar_id)
+            full = True
+            events, next_token = self.fetch_changes(calendar_id, None, time_min)
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM calendar_mirror WHERE calendar_id = ?", (calendar_id,))
+            for event in events:
+                if event.get("status") == "cancelled":
+                    self._conn.execute(
+                        "DELETE FROM calendar_mirror WHERE calendar_id = ? AND event_id = ?",
+                        (calendar_id, event["id"]),
+                    )
+                    continue
+                start = event.get("start", {})
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO calendar_mirror(
+                        calendar_id, event_id, start_utc, end_utc, start_raw, summary, transparent)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        calendar_id,
+                        event["id"],
+                        _utc(start),
+                        _utc(event.get("end", start)),
+                        start.get("dateTime") or start.get("date", ""),
+                        event.get("summary", ""),
+                        int(event.get("transparency") == "transparent"),
+                    ),
+                )
+            # Incremental syncs never remove past events; prune with the full sync's window.
+            self._conn.execute(
+                "DELETE FROM calendar_mirror WHERE calendar_id = ? AND end_utc < ?",
+                (calendar_id, time_min.isoformat(timespec="seconds")),
+            )
+            self._conn.execute(
+                """
+                INSERT INTO calendar_sync(calendar_id, sync_token, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(calendar_id) DO UPDATE SET sync_token=excluded.sync_token, synced_at=excluded.synced_at
+                """,
+                (calendar_id, next_token, time.time()),
+            )
+        return len(events)
+
+    def sync_all(self, calendar_ids):
+        for calendar_id in calendar_ids:
+            try:
+                self.sync(calendar_id)
+            except Exception as exc:
+                logging.error("Calendar sync failed for %s: %s", calendar_id, exc)
+
+    def is_fresh(self, calendar_id: str, max_age: float) -> bool:
+        _, synced_at = self._state(calendar_id)
+        return synced_at is not None and time.time() - synced_at <= max_age
+
+    def events_between(self, calendar_id: str, start_dt: datetime, end_dt: datetime):
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT event_id, start_utc, end_utc, start_raw, summary, transparent FROM calendar_mirror
+                WHERE calendar_id = ? AND start_utc < ? AND end_utc > ?
+                ORDER BY start_utc
+                """,
+                (calendar_id, end_dt.isoformat(timespec="seconds"), start_dt.isoformat(timespec="seconds")),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_conflict(self, calendar_id: str, start_dt: datetime, end_dt: datetime) -> bool:
+        return any(not row["transparent"] for row in self.events_between(calendar_id, start_dt, end_dt))
@@ -0,0 +1,93 @@
+from bisect import bisect_left
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+
+class ChatListModel(QAbstractListModel):
+    # Newest first; _keys are ascending (last_message_at, chat_id), so view row r is key len - 1 - r.
+    ChatIdRole = Qt.UserRole
+    UnreadRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._keys = []
+        self._chats = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._keys):
+            return None
+        chat_id = self.chat_id_at(index.row())
+        display_name, _, unread = self._chats[chat_id]
+        if role == Qt.DisplayRole:
+            label = f"{display_name} ({chat_id})" if display_name else chat_id
+            return f"{label}  • {unread}" if unread else label
+        if role == self.ChatIdRole:
+            return chat_id
+        if role == self.UnreadRole:
+            return unread
+        return None
+
+    def chat_id_at(self, row: int) -> str:
+        return self._keys[len(self._keys) - 1 - row][1]
+
+    def row_of(self, chat_id: str) -> int:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return -1
+        return len(self._keys) - 1 - bisect_left(self._keys, (chat[1], chat_id))
+
+    def load(self, rows):
+        self.beginResetModel()
+        self._chats = {
+            chat_id: [display_name, last_message_at or "", unread_count or 0]
+            for chat_id, display_name, last_message_at, unread_count in rows
+        }
+        self._keys = sorted((chat[1], chat_id) for chat_id, chat in self._chats.items())
+        self.endResetModel()
+
+    def upsert(self, chat_id: str, display_name: str, last_message_at: str, unread_delta: int = 1):
+        last_message_at = last_message_at or ""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            key_index = bisect_left(self._keys, (last_message_at, chat_id))
+            row = len(self._keys) - key_index
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._keys.insert(key_index, (last_message_at, chat_id))
+            self._chats[chat_id] = [display_name, last_message_at, unread_delta]
+            self.endInsertRows()
+            return
+
+        last_row = len(self._keys) - 1
+        old_key = (chat[1], chat_id)
+        old_index = bisect_left(self._keys, old_key)
+        new_key = (last_message_at, chat_id)
+        del self._keys[old_index]
+        new_index = bisect_left(self._keys, new_key)
+        self._keys.insert(old_index, old_key)
+        old_row, new_row = last_row - old_index, last_row - new_index
+
+        if new_row != old_row:
+            # Qt's destination is the row the item goes in front of, counted before the move.
+            destination = new_row if new_row < old_row else new_row + 1
+            self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), destination)
+            del self._keys[old_index]
+            self._keys.insert(new_index, new_key)
+            self.endMoveRows()
+        else:
+            self._keys[old_index] = new_key
+        chat[0] = display_name or chat[0]
+        chat[1] = last_message_at
+        chat[2] += unread_delta
+        index = self.index(new_row)
+        self.dataChanged.emit(index, index)
+
+    def mark_read(self, chat_id: str):
+        chat = self._chats.get(chat_id)
+        if chat is None or not chat[2]:
+            return
+        chat[2] = 0
+        index = self.index(self.row_of(chat_id))
+        self.dataChanged.emit(index, index)
@@ -19,6 +19,7 @@ class AppConfig:
     local_api_port: int = 8765
     google_creds_path: str = ""
     service_calendar_mapping: List[Dict[str, str]] = field(default_factory=list)
+    calendar_sync_seconds: int = 60
 
     @classmethod
     def load(cls, path: str) -> "AppConfig":
@@ -32,6 +33,7 @@ class AppConfig:
             local_api_port=data.get("local_api_port", 8765),
             google_creds_path=data.get("google_creds_path", ""),
             service_calendar_mapping=data.get("service_calendar_mapping", []),
+            calendar_sync_seconds=data.get("calendar_sync_seconds", 60),
         )
 
     def save(self, path: str):
@@ -44,6 +46,7 @@ class AppConfig:
                     "local_api_port": self.local_api_port,
                     "google_creds_path": self.google_creds_path,
                     "service_calendar_mapping": self.service_calendar_mapping,
+                    "calendar_sync_seconds": self.calendar_sync_seconds,
                 },
                 handle,
                 indent=2,
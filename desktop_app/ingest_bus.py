@@ -0,0 +1,88 @@
+import threading
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+
+class ChatUpdate:
+    __slots__ = ("chat_id", "display_name", "last_message_at", "unread_delta", "lines")
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.display_name = ""
+        self.last_message_at = ""
+        self.unread_delta = 0
+        self.lines = []
+
+
+class IngestBus(QObject):
+    # Merges incoming rows per chat on any thread; the GUI thread applies them at most once per frame.
+    flushed = Signal(list)
+    _wake = Signal()
+
+    def __init__(self, frame_interval_ms: int = 16, max_pending_lines: int = 5000, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_lines = 0
+        self._wake_sent = False
+        self.max_pending_lines = max_pending_lines
+        self.published = 0
+        self.merged = 0
+        self.dropped = 0
+        self.flushes = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(frame_interval_ms)
+        self._timer.timeout.connect(self._flush)
+        self._wake.connect(self._schedule, Qt.QueuedConnection)
+
+    def publish(self, rows):
+        # rows as stored by Database.add_incoming_batch.
+        with self._lock:
+            for chat_id, display_name, text, ts, _ in rows:
+                update = self._pending.get(chat_id)
+                if update is None:
+                    update = self._pending[chat_id] = ChatUpdate(chat_id)
+                else:
+                    self.merged += 1
+                update.display_name = display_name or update.display_name
+                update.last_message_at = max(update.last_message_at, ts or "")
+                update.unread_delta += 1
+                if self._pending_lines < self.max_pending_lines:
+                    update.lines.append(f"{display_name}: {text}")
+                    self._pending_lines += 1
+                else:
+                    self.dropped += 1
+                self.published += 1
+            wake = not self._wake_sent
+            self._wake_sent = True
+        if wake:
+            self._wake.emit()
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(update.unread_delta for update in self._pending.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": sum(update.unread_delta for update in self._pending.values()),
+                "published": self.published,
+                "merged": self.merged,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+            }
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            updates = list(self._pending.values())
+            self._pending = {}
+            self._pending_lines = 0
+            self._wake_sent = False
+        if updates:
+            self.flushes += 1
+            self.flushed.emit(updates)
@@ -4,9 +4,33 @@ import logging
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from threading import Thread
 
+INCOMING_PATH = "/api/telegram/incoming"
+BATCH_PATH = "/api/telegram/incoming/batch"
+MAX_BATCH_ITEMS = 1000
+
+
+def parse_batch(raw_body):
+    # JSON array or NDJSON -> (payloads, per-item error results).
+    text = raw_body.decode("utf-8")
+    if text.lstrip().startswith("["):
+        items = json.loads(text)
+        return [(index, item) for index, item in enumerate(items)], []
+    payloads, errors = [], []
+    for index, line in enumerate(line for line in text.splitlines() if line.strip()):
+        try:
+            payloads.append((index, json.loads(line)))
+        except json.JSONDecodeError:
+            errors.append({"index": index, "status": "error", "error": "invalid_json"})
+    return payloads, errors
+
 
 class LocalAPIHandler(BaseHTTPRequestHandler):
     server_version = "StoDesktopLocalAPI/1.0"
+    # Keep-alive for the bot's push client; every response carries Content-Length.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY a kept-alive
+    # connection waits for the client's delayed ACK (~40 ms) on every response.
+    disable_nagle_algorithm = True
 
     def _send_json(self, status, payload):
         body = json.dumps(payload).encode("utf-8")
@@ -17,7 +41,8 @@ class LocalAPIHandler(BaseHTTPRequestHandler):
         self.wfile.write(body)
 
     def do_POST(self):
-        if self.path != "/api/telegram/incoming":
+        if self.path not in (INCOMING_PATH, BATCH_PATH):
+            self.close_connection = True
             self._send_json(404, {"error": "not_found"})
             return
 
@@ -32,6 +57,10 @@ class LocalAPIHandler(BaseHTTPRequestHandler):
             self._send_json(401, {"error": "invalid_signature"})
             return
 
+        if self.path == BATCH_PATH:
+            self._handle_batch(raw_body)
+            return
+
         try:
             payload = json.loads(raw_body.decode("utf-8"))
         except json.JSONDecodeError:
@@ -41,23 +70,53 @@ class LocalAPIHandler(BaseHTTPRequestHandler):
         self.server.on_message(payload)
         self._send_json(200, {"status": "ok"})
 
+    def _handle_batch(self, raw_body):
+        try:
+            payloads, errors = parse_batch(raw_body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send_json(400, {"error": "invalid_json"})
+            return
+        if len(payloads) + len(errors) > MAX_BATCH_ITEMS:
+            self._send_json(413, {"error": "batch_too_large", "max_items": MAX_BATCH_ITEMS})
+            return
+
+        results = list(errors)
+        valid = []
+        for index, payload in payloads:
+            if isinstance(payload, dict) and payload.get("chat_id"):
+                valid.append((index, payload))
+            else:
+                results.append({"index": index, "status": "error", "error": "invalid_item"})
+        if valid:
+            try:
+                self.server.on_batch([payload for _, payload in valid])
+            except Exception as exc:
+                logging.exception("LOCAL_API_BATCH_FAILED")
+                self._send_json(500, {"error": "storage_failed", "detail": str(exc)})
+                return
+            results.extend({"index": index, "status": "ok"} for index, _ in valid)
+        results.sort(key=lambda result: result["index"])
+        self._send_json(200, {"status": "ok", "accepted": len(valid), "results": results})
+
     def log_message(self, format, *args):
         logging.info("Local API - %s", format % args)
 
 
 class LocalAPIServer(Thread):
-    def __init__(self, host, port, shared_secret, on_message):
+    def __init__(self, host, port, shared_secret, on_message, on_batch=None):
         super().__init__(daemon=True)
         self.host = host
         self.port = port
         self.shared_secret = shared_secret
         self.on_message = on_message
+        self.on_batch = on_batch or (lambda payloads: [on_message(payload) for payload in payloads])
         self.httpd = None
 
     def run(self):
         self.httpd = ThreadingHTTPServer((self.host, self.port), LocalAPIHandler)
         self.httpd.shared_secret = self.shared_secret
         self.httpd.on_message = self.on_message
+        self.httpd.on_batch = self.on_batch
         logging.info("Local API server listening on %s:%s", self.host, self.port)
         self.httpd.serve_forever()
 
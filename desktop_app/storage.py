@@ -1,4 +1,7 @@
 import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 
 
@@ -30,24 +33,78 @@ CREATE TABLE IF NOT EXISTS calendar_events (
     created_at TEXT
 );
 CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts);
+CREATE INDEX IF NOT EXISTS idx_chats_last_message_at ON chats(last_message_at);
 """
 
 
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class _ThreadConnection:
+    # Lives in the owning thread's threading.local; collected when that thread exits.
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
 class Database:
+    # One WAL connection per thread; writes are serialized by _write_lock.
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
         self._init_db()
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._connections_lock:
+                self._connections.add(conn)
+            # Short-lived threads (one per local API connection) give their connection back on exit.
+            weakref.finalize(holder, self._release, conn)
+        return holder.conn
+
+    def _release(self, conn):
+        with self._connections_lock:
+            if conn not in self._connections:
+                return
+            self._connections.discard(conn)
+        conn.close()
+
+    @contextmanager
+    def _write(self):
+        with self._write_lock:
+            conn = self._get_conn()
+            with conn:
+                yield conn
 
     def _init_db(self):
-        with self._get_conn() as conn:
+        with self._write() as conn:
             conn.executescript(SCHEMA)
 
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
     def upsert_chat(self, chat_id: str, display_name: str):
         now = datetime.utcnow().isoformat()
-        with self._get_conn() as conn:
+        with self._write() as conn:
             conn.execute(
                 """
                 INSERT INTO chats(chat_id, display_name, created_at, last_message_at, unread_count)
@@ -60,7 +117,7 @@ class Database:
             )
 
     def add_message(self, chat_id: str, direction: str, text: str, ts: str, status: str, meta_json: str = ""):
-        with self._get_conn() as conn:
+        with self._write() as conn:
             conn.execute(
                 """
                 INSERT INTO messages(chat_id, direction, text, ts, status, meta_json)
@@ -73,9 +130,36 @@ class Database:
                 (ts, chat_id),
             )
 
+    def add_incoming_batch(self, items):
+        # One transaction; items are (chat_id, display_name, text, ts, meta_json).
+        now = datetime.utcnow().isoformat()
+        with self._write() as conn:
+            conn.executemany(
+                """
+                INSERT INTO chats(chat_id, display_name, created_at, last_message_at, unread_count)
+                VALUES (?, ?, ?, ?, 1)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                    display_name=excluded.display_name,
+                    last_message_at=excluded.last_message_at,
+                    unread_count=chats.unread_count + 1
+                """,
+                [(chat_id, name, now, ts) for chat_id, name, _, ts, _ in items],
+            )
+            conn.executemany(
+                """
+                INSERT INTO messages(chat_id, direction, text, ts, status, meta_json)
+                VALUES (?, 'in', ?, ?, 'sent', ?)
+                """,
+                [(chat_id, text, ts, meta_json) for chat_id, _, text, ts, meta_json in items],
+            )
+
+    def mark_chat_read(self, chat_id: str):
+        with self._write() as conn:
+            conn.execute("UPDATE chats SET unread_count = 0 WHERE chat_id = ?", (chat_id,))
+
     def add_calendar_event(self, chat_id: str, calendar_id: str, event_id: str, start_ts: str, end_ts: str):
         now = datetime.utcnow().isoformat()
-        with self._get_conn() as conn:
+        with self._write() as conn:
             conn.execute(
                 """
                 INSERT INTO calendar_events(chat_id, calendar_id, event_id, start_ts, end_ts, created_at)
@@ -85,20 +169,52 @@ class Database:
             )
 
     def get_chats(self):
-        with self._get_conn() as conn:
-            rows = conn.execute(
-                "SELECT chat_id, display_name, last_message_at, unread_count FROM chats ORDER BY last_message_at DESC"
-            ).fetchall()
-        return rows
+        return self._get_conn().execute(
+            "SELECT chat_id, display_name, last_message_at, unread_count FROM chats ORDER BY last_message_at DESC"
+        ).fetchall()
 
     def get_messages(self, chat_id: str):
-        with self._get_conn() as conn:
-            rows = conn.execute(
+        return self._get_conn().execute(
+            """
+            SELECT direction, text, ts, status FROM messages
+            WHERE chat_id = ?
+            ORDER BY ts ASC
+            """,
+            (chat_id,),
+        ).fetchall()
+
+    def get_messages_page(self, chat_id: str, before=None, after=None, limit: int = 50):
+        # Keyset page in chronological order; before/after are the (ts, id) of the first/last row shown.
+        if after is not None:
+            rows = self._get_conn().execute(
+                """
+                SELECT id, direction, text, ts, status FROM messages
+                WHERE chat_id = ? AND (ts, id) > (?, ?)
+                ORDER BY ts ASC, id ASC
+                LIMIT ?
+                """,
+                (chat_id, after[0], after[1], limit),
+            ).fetchall()
+            return rows
+        if before is not None:
+            rows = self._get_conn().execute(
+                """
+                SELECT id, direction, text, ts, status FROM messages
+                WHERE chat_id = ? AND (ts, id) < (?, ?)
+                ORDER BY ts DESC, id DESC
+                LIMIT ?
+                """,
+                (chat_id, before[0], before[1], limit),
+            ).fetchall()
+        else:
+            rows = self._get_conn().execute(
                 """
-                SELECT direction, text, ts, status FROM messages
+                SELECT id, direction, text, ts, status FROM messages
                 WHERE chat_id = ?
-                ORDER BY ts ASC
+                ORDER BY ts DESC, id DESC
+                LIMIT ?
                 """,
-                (chat_id,),
+                (chat_id, limit),
             ).fetchall()
+        rows.reverse()
         return rows
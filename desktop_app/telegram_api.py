@@ -1,12 +1,66 @@
 import logging
+import threading
+import time
+
 import requests
 
+GLOBAL_PER_SECOND = 30
+CHAT_INTERVAL = 1.0
+GROUP_INTERVAL = 3.0
+MAX_RETRIES = 3
+
+
+class OutboundLimiter:
+    # Thread-safe pacing for Telegram sends: a global slot plus one per chat.
+    def __init__(self, global_per_second=GLOBAL_PER_SECOND, chat_interval=CHAT_INTERVAL,
+                 group_interval=GROUP_INTERVAL):
+        self.global_interval = 1.0 / global_per_second
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self._lock = threading.Lock()
+        self._next_global = 0.0
+        self._next_chat = {}
+
+    def reserve(self, chat_id):
+        # Returns how long to wait for the slot; the slot is reserved right away.
+        key = str(chat_id)
+        interval = self.group_interval if key.startswith("-") else self.chat_interval
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_global, self._next_chat.get(key, 0.0))
+            self._next_global = start + self.global_interval
+            self._next_chat[key] = start + interval
+            if len(self._next_chat) > 1000:
+                self._next_chat = {k: v for k, v in self._next_chat.items() if v > now}
+            return start - now
+
+    def block(self, chat_id, seconds):
+        with self._lock:
+            key = str(chat_id)
+            self._next_chat[key] = max(self._next_chat.get(key, 0.0), time.monotonic() + seconds)
+
+
+_limiter = OutboundLimiter()
+
 
 def send_message(bot_token: str, chat_id: str, text: str):
     if not bot_token:
         raise ValueError("BOT_TOKEN missing")
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    response = requests.post(url, data={"chat_id": chat_id, "text": text})
+    for attempt in range(MAX_RETRIES + 1):
+        delay = _limiter.reserve(chat_id)
+        if delay > 0:
+            time.sleep(delay)
+        response = requests.post(url, data={"chat_id": chat_id, "text": text})
+        if response.status_code == 429 and attempt < MAX_RETRIES:
+            try:
+                retry_after = response.json()["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                retry_after = 1
+            logging.warning("Telegram flood control for %s: retry in %ss", chat_id, retry_after)
+            _limiter.block(chat_id, retry_after)
+            continue
+        break
     if not response.ok:
         logging.error("Telegram send failed: %s", response.text)
         return False, response.text
@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class WriteQueue:
+    # One writer thread commits whatever is queued in one transaction; max_delay > 0 lingers for more rows.
+    def __init__(self, db, max_batch: int = 200, max_delay: float = 0.0):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, chat_id: str, display_name: str, text: str, ts: str, meta_json: str = "") -> Future:
+        return self.submit_many([(chat_id, display_name, text, ts, meta_json)])
+
+    def submit_many(self, rows) -> Future:
+        # The rows are one unit: committed in the same transaction, never split at max_batch.
+        if self._closed:
+            raise RuntimeError("write queue is closed")
+        future = Future()
+        self._queue.put((list(rows), future))
+        return future
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: float = 5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            size = len(first[0])
+            deadline = time.monotonic() + self.max_delay
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    # Flush what is already queued, then exit.
+                    stopping = True
+                    continue
+                batch.append(item)
+                size += len(item[0])
+            self._commit(batch)
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for unit in leftover:
+            self._commit([unit])
+
+    def _commit(self, batch):
+        rows = [row for unit_rows, _ in batch for row in unit_rows]
+        try:
+            self.db.add_incoming_batch(rows)
+        except Exception as exc:
+            if len(batch) > 1:
+                # Retry unit by unit so one bad submission does not fail the others.
+                for unit in batch:
+                    self._commit([unit])
+                return
+            logging.error("Group commit of %s messages failed: %s", len(rows), exc)
+            batch[0][1].set_exception(exc)
+            return
+        self.batches += 1
+        self.items += len(rows)
+        for _, future in batch:
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": self.items / self.batches if self.batches else 0.0,
+        }
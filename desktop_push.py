@@ -1,14 +1,286 @@
+import asyncio
 import hmac
 import json
 import logging
 import os
 from datetime import datetime
 
-import requests
+import aiohttp
+
+from metrics import DESKTOP_PUSH_SECONDS
+
+
+class DesktopUnavailable(Exception):
+    pass
+
+
+class DesktopPusher:
+    # Один воркер і один порядок: подія в обробці → черга в пам'яті → спул на диску.
+    # Поки у спулі є хоч щось або desktop недоступний, нові події теж ідуть у спул, інакше вони обігнали б старіші.
+    def __init__(self, url, secret, spool_path, queue_size=1000, timeout=2,
+                 retry_delay=1.0, max_retry_delay=30.0, max_spool_bytes=50 * 1024 * 1024, batch_size=200):
+        self.url = url
+        self.batch_url = f"{url}/batch"
+        self.batch_size = batch_size
+        self._batch_supported = True
+        self.secret = secret
+        self.spool_path = spool_path
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_spool_bytes = max_spool_bytes
+        self._queue = asyncio.Queue(queue_size)
+        self._head = None
+        self._wakeup = asyncio.Event()
+        self._session = None
+        self._task = None
+        self._unavailable = False
+        self._spooled = self._count_spool()
+        self.sent = 0
+        self.spooled_total = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._task:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=1, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._task = asyncio.create_task(self._worker())
+
+    async def close(self, timeout=5):
+        if not self._task:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._head is not None or not self._queue.empty()) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Те, що не встигли доставити, чекатиме наступного запуску на початку спулу.
+        self._persist_memory()
+        await self._session.close()
+        self._session = None
+
+    def queued(self):
+        return self._queue.qsize() + (self._head is not None)
+
+    def spooled(self):
+        return self._spooled
+
+    def push(self, payload):
+        self.start()
+        if self._spooled or self._unavailable:
+            self._spool([payload])
+        else:
+            try:
+                self._queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self._spool([payload])
+        self._wakeup.set()
+
+    async def _worker(self):
+        delay = self.retry_delay
+        while True:
+            try:
+                if self._head is None and not self._queue.empty():
+                    self._head = self._queue.get_nowait()
+                    self._queue.task_done()
+                if self._head is not None:
+                    await self._send(self._head)
+                    self._head = None
+                elif self._spooled:
+                    await self._replay()
+                else:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                self._unavailable = False
+                delay = self.retry_delay
+            except asyncio.CancelledError:
+                raise
+            except DesktopUnavailable as e:
+                # Поки desktop лежить, усе має бути на диску: падіння бота не втратить події з пам'яті.
+                self._unavailable = True
+                self._persist_memory()
+                logging.warning(f"⚠️ Desktop недоступний ({e}), у спулі {self._spooled}; повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            except Exception as e:
+                logging.error(f"❌ Desktop push worker error: {e}")
+                self._head = None
+                await asyncio.sleep(delay)
+
+    async def _post(self, url, body):
+        signature = hmac.new(self.secret.encode("utf-8"), body, "sha256").hexdigest()
+        try:
+            with DESKTOP_PUSH_SECONDS.time():
+                async with self._session.post(
+                    url,
+                    data=body,
+                    headers={"Content-Type": "application/json", "X-Signature": signature},
+                ) as resp:
+                    return resp.status, await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise DesktopUnavailable(str(e) or e.__class__.__name__)
+
+    async def _send(self, payload):
+        status, _ = await self._post(self.url, json.dumps(payload).encode("utf-8"))
+        if status >= 500:
+            raise DesktopUnavailable(f"HTTP {status}")
+        if status >= 400:
+            # Підпис або формат відхилено — повтор не допоможе.
+            self.dropped += 1
+            logging.error(f"❌ Desktop rejected push: HTTP {status}")
+            return
+        self.sent += 1
+
+    async def _send_batch(self, lines):
+        # False — desktop не знає /batch, слати треба по одній.
+        status, body = await self._post(self.batch_url, b"".join(lines))
+        if status == 404:
+            # Старіша версія desktop-застосунку.
+            self._batch_supported = False
+            return False
+        if status >= 500:
+            raise DesktopUnavailable(f"HTTP {status}")
+        if status >= 400:
+            self.dropped += len(lines)
+            logging.error(f"❌ Desktop rejected batch of {len(lines)}: HTTP {status}")
+            return True
+        results = json.loads(body).get("results", [])
+        failed = sum(1 for result in results if result.get("status") != "ok")
+        if failed:
+            logging.error(f"❌ Desktop rejected {failed} of {len(lines)} spooled events")
+        self.dropped += failed
+        self.sent += len(lines) - failed
+        return True
+
+    async def _replay(self):
+        # Спул іде на /batch: одна транзакція на desktop замість однієї на подію.
+        offset = self._read_offset()
+        with open(self.spool_path, "rb") as f:
+            f.seek(offset)
+            while True:
+                lines, ends, size = [], [], 0
+                for line in f:
+                    size += len(line)
+                    if line.strip():
+                        lines.append(line if line.endswith(b"\n") else line + b"\n")
+                        ends.append(size)
+                    if len(lines) >= self.batch_size:
+                        break
+                if not size:
+                    break
+                if lines and not (self._batch_supported and await self._send_batch(lines)):
+                    # По одній: зсув рухається після кожної, щоб збій посеред пачки не дублював надіслане.
+                    for line, end in zip(lines, ends):
+                        await self._send(json.loads(line))
+                        self._spooled = max(0, self._spooled - 1)
+                        self._write_offset(offset + end)
+                elif lines:
+                    self._spooled = max(0, self._spooled - len(lines))
+                offset += size
+                self._write_offset(offset)
+        # Спул вичерпано: нові події до цього моменту теж дописувались у нього і вже відправлені.
+        os.remove(self.spool_path)
+        self._remove_offset()
+        self._spooled = 0
+        logging.info("✅ Desktop spool replayed")
+
+    def _persist_memory(self):
+        items = [] if self._head is None else [self._head]
+        self._head = None
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if not items:
+            return
+        if not self._spooled:
+            self._spool(items)
+            return
+        # Події з пам'яті старші за спул — переписуємо його з ними на початку.
+        with open(self.spool_path, "rb") as f:
+            f.seek(self._read_offset())
+            rest = f.read()
+        tmp = f"{self.spool_path}.tmp"
+        with open(tmp, "wb") as f:
+            for payload in items:
+                f.write((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.write(rest)
+        os.replace(tmp, self.spool_path)
+        self._remove_offset()
+        self._spooled += len(items)
+
+    def _spool(self, payloads):
+        if not payloads:
+            return
+        if os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) > self.max_spool_bytes:
+            self.dropped += len(payloads)
+            logging.error(f"❌ Desktop spool full, dropped {len(payloads)} events")
+            return
+        folder = os.path.dirname(self.spool_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for payload in payloads:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        self._spooled += len(payloads)
+        self.spooled_total += len(payloads)
+
+    def _count_spool(self):
+        if not os.path.exists(self.spool_path):
+            return 0
+        with open(self.spool_path, "rb") as f:
+            f.seek(self._read_offset())
+            return sum(1 for line in f if line.strip())
+
+    def _read_offset(self):
+        try:
+            with open(f"{self.spool_path}.offset") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset):
+        with open(f"{self.spool_path}.offset", "w") as f:
+            f.write(str(offset))
+
+    def _remove_offset(self):
+        try:
+            os.remove(f"{self.spool_path}.offset")
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {
+            "queued": self.queued(),
+            "spooled": self._spooled,
+            "sent": self.sent,
+            "spooled_total": self.spooled_total,
+            "dropped": self.dropped,
+        }
+
+
+_pusher = None
+
+
+def get_pusher():
+    global _pusher
+    if _pusher is None:
+        port = os.getenv("DESKTOP_LOCAL_PORT", "8765")
+        _pusher = DesktopPusher(
+            f"http://127.0.0.1:{port}/api/telegram/incoming",
+            os.getenv("DESKTOP_SHARED_SECRET", ""),
+            os.getenv("DESKTOP_SPOOL_PATH", "data/desktop_spool.jsonl"),
+            queue_size=int(os.getenv("DESKTOP_PUSH_QUEUE", "1000")),
+        )
+    return _pusher
 
 
 def push_to_desktop(chat_id, user_name, text, ts=None, message_id=None):
-    port = os.getenv("DESKTOP_LOCAL_PORT", "8765")
     secret = os.getenv("DESKTOP_SHARED_SECRET", "")
     if not secret:
         logging.info("Desktop push skipped: missing DESKTOP_SHARED_SECRET")
@@ -20,14 +292,4 @@ def push_to_desktop(chat_id, user_name, text, ts=None, message_id=None):
         "ts": ts or datetime.utcnow().isoformat(),
         "message_id": str(message_id) if message_id is not None else "",
     }
-    body = json.dumps(payload).encode("utf-8")
-    signature = hmac.new(secret.encode("utf-8"), body, "sha256").hexdigest()
-    try:
-        requests.post(
-            f"http://127.0.0.1:{port}/api/telegram/incoming",
-            data=body,
-            headers={"Content-Type": "application/json", "X-Signature": signature},
-            timeout=2,
-        )
-    except Exception as exc:
-        logging.error("Desktop push failed: %s", exc)
+    get_pusher().push(payload)
@@ -1,10 +1,51 @@
+import os
+import threading
+import httplib2
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 from config import SERVICE_TYPES
+from metrics import CALENDAR_SECONDS
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 SERVICE_ACCOUNT_FILE = 'creds.json'
+# Для емулятора або бенчмарку; порожньо — справжній Google API.
+API_ENDPOINT = os.getenv('GOOGLE_CALENDAR_API_ENDPOINT', '')
+HTTP_TIMEOUT = 30
+
+KYIV = ZoneInfo('Europe/Kiev')
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+# Довгоживучий пул: потоки (і їхні клієнти в _local з keep-alive) переживають окремі читання.
+_reader_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='calendar-read')
+
+def get_credentials():
+    # Ключ читається один раз; OAuth-токен живе в об'єкті й оновлюється лише після закінчення.
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = service_account.Credentials.from_service_account_file(
+                    SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    return _credentials
+
+def get_service():
+    # httplib2.Http не потокобезпечний, тому клієнт (і його keep-alive з'єднання) — свій на кожен потік.
+    service = getattr(_local, 'service', None)
+    if service is None:
+        http = AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        service = build(
+            'calendar', 'v3', http=http,
+            static_discovery=True, cache_discovery=False,
+            client_options={'api_endpoint': API_ENDPOINT} if API_ENDPOINT else None,
+        )
+        _local.service = service
+    return service
 
 SERVICE_TYPE_COLORS = {
     "Рихтовка/покраска": "5",  # Yellow
@@ -15,11 +56,9 @@ SERVICE_TYPE_COLORS = {
 def add_to_calendar(summary, description, start_str, service_type,
                     duration_minutes=30, calendar_id=None,
                     user_id=None, chat_id=None, full_name=None,
-                    phone=None, car=None):
+                    phone=None, car=None, event_id=None):
     
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_service()
 
     start_time = datetime.strptime(start_str, '%Y-%m-%d %H:%M')
     end_time = start_time + timedelta(minutes=duration_minutes)
@@ -44,57 +83,145 @@ def add_to_calendar(summary, description, start_str, service_type,
         }
     }
 
+    if event_id:
+        event['id'] = event_id
+
     calendar_id = calendar_id or 'primary'
-    return service.events().insert(calendarId=calendar_id, body=event).execute()
+    with CALENDAR_SECONDS.time(method='events.insert', calendar_id=calendar_id):
+        return service.events().insert(calendarId=calendar_id, body=event).execute()
+
+def get_event(calendar_id, event_id):
+    service = get_service()
+    with CALENDAR_SECONDS.time(method='events.get', calendar_id=calendar_id):
+        return service.events().get(calendarId=calendar_id, eventId=event_id).execute()
+
+def query_free_busy(calendar_ids, time_min, time_max):
+    service = get_service()
+
+    body = {
+        'timeMin': time_min.replace(tzinfo=KYIV).isoformat(),
+        'timeMax': time_max.replace(tzinfo=KYIV).isoformat(),
+        'timeZone': 'Europe/Kiev',
+        'items': [{'id': calendar_id} for calendar_id in calendar_ids],
+    }
+    with CALENDAR_SECONDS.time(method='freebusy.query', calendar_id=','.join(calendar_ids)):
+        result = service.freebusy().query(body=body).execute()
+
+    busy = {}
+    for calendar_id, info in result.get('calendars', {}).items():
+        if info.get('errors'):
+            raise RuntimeError(f"freeBusy error for {calendar_id}: {info['errors']}")
+        busy[calendar_id] = [
+            (
+                datetime.fromisoformat(period['start']).astimezone(KYIV).replace(tzinfo=None),
+                datetime.fromisoformat(period['end']).astimezone(KYIV).replace(tzinfo=None),
+            )
+            for period in info.get('busy', [])
+        ]
+    return busy
+
+REMINDER_FIELDS = 'nextPageToken,items(id,status,start(dateTime,date),extendedProperties/private)'
+
+def list_events(calendar_id, time_min, time_max, fields=REMINDER_FIELDS, page_size=250):
+    # Кожен виклик — у своєму потоці, тому й клієнт свій (get_service кешує його на потік).
+    service = get_service()
+    events = []
+    page_token = None
+    while True:
+        with CALENDAR_SECONDS.time(method='events.list', calendar_id=calendar_id):
+            result = service.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.replace(tzinfo=KYIV).isoformat(),
+                timeMax=time_max.replace(tzinfo=KYIV).isoformat(),
+                singleEvents=True,
+                orderBy='startTime',
+                maxResults=page_size,
+                pageToken=page_token,
+                fields=fields,
+            ).execute()
+        events.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return events
+
+SYNC_FIELDS = (
+    'nextPageToken,nextSyncToken,'
+    'items(id,status,summary,transparency,start(dateTime,date),end(dateTime,date),extendedProperties/private)'
+)
+
+def sync_events(calendar_id, sync_token=None, time_min=None, page_size=250):
+    # Без sync_token — повна синхронізація від time_min; з ним — лише зміни (включно зі скасованими).
+    # HttpError 410 означає, що токен протух і потрібна повна синхронізація.
+    service = get_service()
+    events = []
+    page_token = None
+    while True:
+        params = dict(calendarId=calendar_id, singleEvents=True, maxResults=page_size,
+                      pageToken=page_token, fields=SYNC_FIELDS)
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            params['timeMin'] = time_min.replace(tzinfo=KYIV).isoformat()
+        with CALENDAR_SECONDS.time(method='events.sync', calendar_id=calendar_id):
+            result = service.events().list(**params).execute()
+        events.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return events, result.get('nextSyncToken')
+
+def reminder_from_event(event):
+    ep = event.get('extendedProperties', {}).get('private', {})
+    if not (ep.get('user_id') and ep.get('chat_id')):
+        print(f"⚠️ Пропущено {event.get('id')}: Немає user_id або chat_id")
+        return None
+    try:
+        return {
+            'event_id': event['id'],
+            'user_id': int(ep['user_id']),
+            'chat_id': int(ep['chat_id']),
+            'full_name': ep.get('full_name', ''),
+            'phone': ep.get('phone', ''),
+            'datetime': event['start'].get('dateTime'),
+            'car': ep.get('car', ''),
+            'service_type': ep.get('service_type', '')
+        }
+    except (KeyError, ValueError) as e:
+        # Одна зіпсована подія не повинна зривати все розсилання.
+        print(f"⚠️ Пропущено {event.get('id')}: некоректні дані події ({e!r})")
+        return None
 
 def get_upcoming_events_for_reminders(days_ahead=0):
-    from pprint import pprint
-    creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
-
-    now = datetime.utcnow() + timedelta(hours=3)
+    now = datetime.now(KYIV).replace(tzinfo=None)
     start_of_day = (now + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = start_of_day + timedelta(days=1)
+    print(f"📅 Перевірка календарів на дату: {start_of_day.date()}")
+    return get_reminders_between(start_of_day, start_of_day + timedelta(days=1))
 
-    reminders = []
+def get_reminders_between(time_min, time_max):
+    # Кілька типів послуг можуть вести один календар — читаємо кожен календар лише раз.
+    calendar_ids = sorted({info['calendar_id'] for info in SERVICE_TYPES.values() if info.get('calendar_id')})
 
-    for service_name, info in SERVICE_TYPES.items():
-        calendar_id = info.get("calendar_id")
-        print(f"📅 Перевірка календаря '{calendar_id}' на дату: {start_of_day.date()}")
+    futures = {
+        calendar_id: _reader_pool.submit(list_events, calendar_id, time_min, time_max)
+        for calendar_id in calendar_ids
+    }
 
+    reminders = []
+    seen = set()
+    for calendar_id, future in futures.items():
         try:
-            events_result = service.events().list(
-                calendarId=calendar_id,
-                timeMin=start_of_day.isoformat() + 'Z',
-                timeMax=end_of_day.isoformat() + 'Z',
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-
-            events = events_result.get('items', [])
-            print(f"🔍 Знайдено {len(events)} подій у {calendar_id}")
-
-            for event in events:
-                print("🔹 Подія:")
-                pprint(event)
-                ep = event.get('extendedProperties', {}).get('private', {})
-                start_time = event['start'].get('dateTime')
-
-                if ep.get('user_id') and ep.get('chat_id'):
-                    reminders.append({
-                        'user_id': int(ep['user_id']),
-                        'chat_id': int(ep['chat_id']),
-                        'full_name': ep.get('full_name', ''),
-                        'phone': ep.get('phone', ''),
-                        'datetime': start_time,
-                        'car': ep.get('car', ''),
-                        'service_type': ep.get('service_type', '')
-                    })
-                else:
-                    print("⚠️ Пропущено: Немає user_id або chat_id")
-
+            events = future.result()
         except Exception as e:
             print(f"❌ Помилка з календарем '{calendar_id}': {e}")
+            continue
+        print(f"🔍 Знайдено {len(events)} подій у {calendar_id}")
+        for event in events:
+            if event.get('status') == 'cancelled' or event['id'] in seen:
+                continue
+            seen.add(event['id'])
+            reminder = reminder_from_event(event)
+            if reminder is None:
+                continue
+            reminders.append(reminder)
 
     print(f"✅ Усього нагадувань: {len(reminders)}")
     return reminders
@@ -0,0 +1,253 @@
+import functools
+import json
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+    id TEXT PRIMARY KEY,
+    next_run_time REAL,
+    job_state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_jobs_next ON scheduler_jobs(next_run_time);
+CREATE TABLE IF NOT EXISTS job_locks (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT,
+    locked_until REAL NOT NULL DEFAULT 0,
+    last_started REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL,
+    outcome TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job_id, started_at);
+"""
+
+
+def _connect(path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SQLiteJobStore(BaseJobStore):
+    # Те саме, що SQLAlchemyJobStore з APScheduler, але на sqlite3 — без нової залежності.
+    def __init__(self, path, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.path = path
+        self.pickle_protocol = pickle_protocol
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+
+    def lookup_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT job_state FROM scheduler_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT next_run_time FROM scheduler_jobs WHERE next_run_time IS NOT NULL "
+                "ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO scheduler_jobs(id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job)),
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE scheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), self._dump(job), job.id),
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM scheduler_jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scheduler_jobs")
+
+    def shutdown(self):
+        with self._lock:
+            self._conn.close()
+
+    def _dump(self, job):
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where="", params=()):
+        jobs, failed = [], []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, job_state FROM scheduler_jobs {where} ORDER BY next_run_time", params
+            ).fetchall()
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed.append((job_id,))
+        if failed:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM scheduler_jobs WHERE id = ?", failed)
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.path})>"
+
+
+class JobRunner:
+    # Оренда в спільній БД: два екземпляри бота не запустять ту саму задачу двічі.
+    def __init__(self, path, owner=None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+
+    def acquire(self, job_id, lease, min_interval):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO job_locks(job_id) VALUES (?)", (job_id,))
+            cursor = self._conn.execute(
+                """
+                UPDATE job_locks SET owner = ?, locked_until = ?, last_started = ?
+                WHERE job_id = ? AND locked_until < ? AND last_started <= ?
+                """,
+                (self.owner, now + lease, now, job_id, now, now - min_interval),
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job_id, succeeded):
+        # Після помилки наступний запуск (тут чи на іншому екземплярі) не чекає min_interval.
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_locks SET locked_until = 0" + ("" if succeeded else ", last_started = 0")
+                + " WHERE job_id = ? AND owner = ?",
+                (job_id, self.owner),
+            )
+
+    def record(self, job_id, started_at, duration, outcome, detail=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_runs(job_id, owner, started_at, duration, outcome, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, self.owner, started_at, duration, outcome,
+                 None if detail is None else json.dumps(detail, ensure_ascii=False, default=str)),
+            )
+
+    def recent_runs(self, job_id=None, limit=20):
+        query = "SELECT job_id, owner, started_at, duration, outcome, detail FROM job_runs"
+        params = ()
+        if job_id:
+            query += " WHERE job_id = ?"
+            params = (job_id,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [
+            dict(zip(("job_id", "owner", "started_at", "duration", "outcome", "detail"), row))
+            for row in rows
+        ]
+
+    def exclusive(self, min_interval=3600, lease=3600):
+        def decorator(func):
+            job_id = func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started_at = time.time()
+                if not self.acquire(job_id, lease, min_interval):
+                    self.record(job_id, started_at, 0.0, "skipped")
+                    logging.info(f"⏭️ Job {job_id} already ran or is running elsewhere")
+                    return None
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    self.release(job_id, succeeded=False)
+                    self.record(job_id, started_at, time.perf_counter() - started, "error", str(e))
+                    logging.error(f"❌ Job {job_id} failed: {e}")
+                    raise
+                self.release(job_id, succeeded=True)
+                self.record(job_id, started_at, time.perf_counter() - started, "ok", result)
+                return result
+
+            return wrapper
+        return decorator
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_scheduler(path, timezone="Europe/Kiev", misfire_grace_time=3600):
+    # coalesce: після простою пропущені запуски зливаються в один, а не виконуються підряд.
+    return AsyncIOScheduler(
+        jobstores={"default": SQLiteJobStore(path)},
+        job_defaults={"coalesce": True, "misfire_grace_time": misfire_grace_time, "max_instances": 1},
+        timezone=timezone,
+    )
+
+
+def ensure_jobs(scheduler, jobs):
+    # Існуючу задачу не перезаписуємо: інакше next_run_time перерахується і пропущений під час рестарту запуск загубиться.
+    wanted = set()
+    for job_id, func, trigger in jobs:
+        wanted.add(job_id)
+        existing = scheduler.get_job(job_id)
+        if existing is not None and repr(existing.trigger) == repr(trigger) and existing.func_ref == _ref(func):
+            continue
+        scheduler.add_job(func, trigger, id=job_id, replace_existing=True)
+    for job in scheduler.get_jobs():
+        if job.id not in wanted:
+            job.remove()
+
+
+def _ref(func):
+    return f"{func.__module__}:{func.__qualname__}"
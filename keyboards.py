@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+OTHER_BRAND = "✏️ Інша марка"
+OTHER_MODEL = "✏️ Інша модель"
+START_BUTTON = "🚀 Почати"
+SLOT_MINUTES = 30
+BOOKING_DAYS = 14
+KYIV = ZoneInfo('Europe/Kiev')
+
+
+def kyiv_now():
+    # Наївний київський час з урахуванням переходу на зимовий/літній час.
+    return datetime.now(KYIV).replace(tzinfo=None)
+
+
+def make_reply_keyboard(options, row_width=2, request_contact=False):
+    kb = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
+    for i in range(0, len(options), row_width):
+        kb.row(*options[i:i+row_width])
+    if request_contact:
+        kb.add(KeyboardButton("📱 Поділитися номером", request_contact=True))
+    return kb
+
+
+def booking_dates(now):
+    dates = []
+    for i in range(BOOKING_DAYS):
+        d = now.date() + timedelta(days=i)
+        if i == 0 and now.hour >= 17:
+            continue
+        dates.append(d.strftime("%Y-%m-%d"))
+    return dates
+
+
+def working_slots(date):
+    day = datetime.fromisoformat(date)
+    start, end = ("09:00", "13:00") if day.weekday() == 5 else ("09:00", "17:30")
+    t = datetime.fromisoformat(f"{date}T{start}")
+    et = datetime.fromisoformat(f"{date}T{end}")
+    slots = []
+    while t <= et:
+        slots.append(t)
+        t += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+
+def booking_times(date, now):
+    return [t.strftime("%H:%M") for t in working_slots(date) if not (t.date() == now.date() and t <= now)]
+
+
+class KeyboardCache:
+    # Каталог (config.py) читається один раз при старті; хто змінює service_types/popular_cars
+    # у пам'яті, викликає invalidate(). Правки config.py на диску підхоплюються лише після перезапуску.
+    def __init__(self, service_types, popular_cars):
+        self.service_types = service_types
+        self.popular_cars = popular_cars
+        self._static = {}
+        self._dynamic = {}
+        self.refresh()
+
+    def refresh(self):
+        static = {
+            ("start", None, None, None): make_reply_keyboard([START_BUTTON], row_width=1),
+            ("stype", None, None, None): make_reply_keyboard(list(self.service_types.keys())),
+            ("brand", None, None, None): make_reply_keyboard(list(self.popular_cars.keys()) + [OTHER_BRAND]),
+            ("model", None, None, None): make_reply_keyboard([OTHER_MODEL]),
+            ("phone", None, None, None): make_reply_keyboard([], request_contact=True),
+            ("remove", None, None, None): ReplyKeyboardRemove(),
+        }
+        for brand, models in self.popular_cars.items():
+            static[("model", None, brand, None)] = make_reply_keyboard(models + [OTHER_MODEL])
+        for stype, info in self.service_types.items():
+            static[("subtype", stype, None, None)] = make_reply_keyboard(info["subtypes"])
+        self._static = static
+        self._dynamic = {}
+
+    def invalidate(self):
+        self.refresh()
+
+    def get(self, step, service_type=None, brand=None, date=None, options=None):
+        key = (step, service_type, brand, date)
+        kb = self._static.get(key)
+        if kb is not None:
+            return kb
+        if step == "model":
+            return self._static[("model", None, None, None)]
+        now = kyiv_now()
+        if step == "year":
+            return self._cached(key, now.year, lambda: make_reply_keyboard(
+                [str(y) for y in range(now.year, 1995, -1)], row_width=3))
+        if step == "date":
+            bucket = (now.date(), now.hour >= 17, options)
+            return self._cached(key, bucket, lambda: make_reply_keyboard(
+                list(options) if options is not None else booking_dates(now), row_width=3))
+        if step == "time":
+            bucket = (self._time_bucket(date, now), options)
+            return self._cached(key, bucket, lambda: make_reply_keyboard(
+                list(options) if options is not None else booking_times(date, now), row_width=3))
+        raise KeyError(key)
+
+    def _time_bucket(self, date, now):
+        today = now.strftime("%Y-%m-%d")
+        if date != today:
+            return today
+        return now.hour * 60 + now.minute - now.minute % SLOT_MINUTES
+
+    def _cached(self, key, bucket, build):
+        entry = self._dynamic.get(key)
+        if entry is not None and entry[0] == bucket:
+            return entry[1]
+        kb = build()
+        self._dynamic[key] = (bucket, kb)
+        if len(self._dynamic) > 2 * BOOKING_DAYS * (len(self.service_types) + 1):
+            self._prune()
+        return kb
+
+    def _prune(self):
+        today = kyiv_now().strftime("%Y-%m-%d")
+        for key in [k for k in self._dynamic if k[3] is not None and k[3] < today]:
+            del self._dynamic[key]
@@ -1,8 +1,34 @@
+import os
 from aiogram.utils.executor import start_polling
-from bot import dp, schedule_jobs, setup_bot_commands
+from bot import dp, schedule_jobs, setup_bot_commands, on_startup, on_shutdown
+from webhook import run_webhook
+from sharded import run_sharded
 import asyncio
 
 if __name__ == '__main__':
-    schedule_jobs()
+    if os.getenv("BOT_MODE", "polling") != "sharded":
+        # У шардованому режимі задачі запускає шард 0.
+        schedule_jobs()
     asyncio.get_event_loop().run_until_complete(setup_bot_commands())
-    start_polling(dp, skip_updates=True)
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        run_webhook(
+            dp,
+            webhook_url=os.getenv("WEBHOOK_URL"),
+            path=os.getenv("WEBHOOK_PATH", "/telegram/webhook"),
+            secret=os.getenv("WEBHOOK_SECRET", ""),
+            host=os.getenv("WEBAPP_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBAPP_PORT", "8080")),
+            max_concurrency=int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32")),
+            drain_timeout=int(os.getenv("WEBHOOK_DRAIN_SECONDS", "30")),
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+        )
+    elif os.getenv("BOT_MODE", "polling") == "sharded":
+        run_sharded(
+            dp,
+            workers=int(os.getenv("BOT_WORKERS", "2")),
+            max_concurrency=int(os.getenv("BOT_WORKER_CONCURRENCY", "32")),
+            report_interval=int(os.getenv("BOT_SHARD_REPORT_SECONDS", "30")),
+        )
+    else:
+        start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
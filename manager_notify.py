@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+
+import aiohttp
+
+from metrics import TELEGRAM_SEND_SECONDS
+from outbound import PRIORITY_NOTIFY, scheduler_for
+
+TELEGRAM_API = "https://api.telegram.org"
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+class ManagerNotifier:
+    def __init__(self, token, workers=2, per_minute=20, burst=3,
+                 digest_threshold=3, max_attempts=5, base_delay=1.0,
+                 api_base=TELEGRAM_API, scheduler=None):
+        self.token = token
+        self.workers = workers
+        self.per_minute = per_minute
+        self.burst = burst
+        self.digest_threshold = digest_threshold
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.api_base = api_base
+        self._pending = {}
+        self._active = set()
+        self.scheduler = scheduler or scheduler_for(token, group_per_minute=per_minute, group_burst=burst)
+        self._ready = asyncio.Queue()
+        self._session = None
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, timeout=10):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"❌ Не всі сповіщення менеджеру надіслані: {self.pending_count()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._session.close()
+        self._session = None
+
+    def pending_count(self):
+        return sum(len(batch) for batch in self._pending.values())
+
+    def notify(self, chat_id, text):
+        chat_id = str(chat_id)
+        self._pending.setdefault(chat_id, []).append(text)
+        self.start()
+        if chat_id not in self._active:
+            self._active.add(chat_id)
+            self._ready.put_nowait(chat_id)
+
+    def _next_message(self, chat_id):
+        batch = self._pending[chat_id]
+        if len(batch) < self.digest_threshold:
+            return batch.pop(0)
+        header = "🔔 <b>Нові заявки: {}</b>"
+        taken = 1
+        size = len(header) + len(batch[0])
+        while taken < len(batch):
+            size += len(DIGEST_SEPARATOR) + len(batch[taken])
+            if size > MESSAGE_LIMIT:
+                break
+            taken += 1
+        items = batch[:taken]
+        del batch[:taken]
+        if taken == 1:
+            return items[0]
+        return header.format(taken) + "\n\n" + DIGEST_SEPARATOR.join(items)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                text = self._next_message(chat_id)
+                await self._send(chat_id, text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"❌ Notify worker error: {e}")
+            finally:
+                if self._pending.get(chat_id):
+                    self._ready.put_nowait(chat_id)
+                else:
+                    self._pending.pop(chat_id, None)
+                    self._active.discard(chat_id)
+                self._ready.task_done()
+
+    async def _send(self, chat_id, text):
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self.base_delay * 2 ** (attempt - 1) + random.uniform(0, self.base_delay)
+            await self.scheduler.wait_turn(chat_id, PRIORITY_NOTIFY)
+            try:
+                with TELEGRAM_SEND_SECONDS.time(method="manager.sendMessage"):
+                    async with self._session.post(url, data=payload) as resp:
+                        status = resp.status
+                        body = await resp.json(content_type=None)
+                if body.get("ok"):
+                    return True
+                retry_after = (body.get("parameters") or {}).get("retry_after")
+                if retry_after:
+                    # Наступна спроба чекатиме в планувальнику, поки чат розблокується.
+                    self.scheduler.retry_after(chat_id, retry_after)
+                    continue
+                if status < 500:
+                    logging.error(f"❌ Notify rejected ({chat_id}): {body.get('description')}")
+                    return False
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.warning(f"⚠️ Notify attempt {attempt} failed ({chat_id}): {e}")
+            if attempt < self.max_attempts:
+                await asyncio.sleep(delay)
+        logging.error(f"❌ Notify gave up after {self.max_attempts} attempts ({chat_id})")
+        return False
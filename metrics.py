@@ -0,0 +1,219 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiohttp import web
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    # Потокобезпечна: календар і desktop push працюють у потоках executor'а.
+    def __init__(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            if "status" in self.labelnames:
+                labels["status"] = status
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _items(self):
+        with self._lock:
+            return [(key, list(series)) for key, series in self._series.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+    def snapshot(self):
+        result = []
+        for key, series in self._items():
+            count = sum(series[:-1])
+            result.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": count,
+                "sum": series[-1],
+                "p50": self._quantile(series, count, 0.50),
+                "p95": self._quantile(series, count, 0.95),
+                "p99": self._quantile(series, count, 0.99),
+            })
+        return result
+
+    def _quantile(self, series, count, q):
+        # Верхня межа бакета, у який потрапляє квантиль — як histogram_quantile без інтерполяції.
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), series):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.counters = {}
+
+    def histogram(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name, help_text, labelnames, buckets)
+        return histogram
+
+    def gauge(self, name, help_text, read):
+        self.gauges[name] = (help_text, read)
+
+    def counter(self, name, help_text, read):
+        # read() повертає лічильник, що лише зростає; назва за правилами Prometheus закінчується на _total.
+        self.counters[name] = (help_text, read)
+
+    def _read_values(self, metrics, kind):
+        values = {}
+        for name, (_, read) in metrics.items():
+            try:
+                values[name] = float(read())
+            except Exception as e:
+                logging.warning(f"⚠️ {kind} {name} failed: {e}")
+        return values
+
+    def _gauge_values(self):
+        return self._read_values(self.gauges, "Gauge")
+
+    def _counter_values(self):
+        return self._read_values(self.counters, "Counter")
+
+    def render(self):
+        lines = []
+        for histogram in self.histograms.values():
+            lines.extend(histogram.render())
+        for name, value in self._gauge_values().items():
+            lines += [f"# HELP {name} {self.gauges[name][0]}", f"# TYPE {name} gauge", f"{name} {value}"]
+        for name, value in self._counter_values().items():
+            lines += [f"# HELP {name} {self.counters[name][0]}", f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {
+            "ts": time.time(),
+            "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            "gauges": self._gauge_values(),
+            "counters": self._counter_values(),
+        }
+
+
+REGISTRY = Registry()
+HANDLER_SECONDS = REGISTRY.histogram(
+    "stobot_handler_seconds", "aiogram handler latency", ("handler",))
+STEP_SECONDS = REGISTRY.histogram(
+    "stobot_step_seconds", "Booking step handler latency", ("step",))
+CALENDAR_SECONDS = REGISTRY.histogram(
+    "stobot_calendar_call_seconds", "Google Calendar API call latency", ("method", "calendar_id", "status"))
+DESKTOP_PUSH_SECONDS = REGISTRY.histogram(
+    "stobot_desktop_push_seconds", "Desktop push latency", ("status",))
+TELEGRAM_SEND_SECONDS = REGISTRY.histogram(
+    "stobot_telegram_send_seconds", "Telegram send call latency", ("method", "status"))
+OUTBOUND_WAIT_SECONDS = REGISTRY.histogram(
+    "stobot_outbound_wait_seconds", "Time spent waiting for the outbound rate limit", ("priority",))
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "stobot_event_loop_lag_seconds", "Event loop scheduling lag")
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def on_process_message(self, message, data: dict):
+        handler = current_handler.get(None)
+        data["_metrics"] = (getattr(handler, "__name__", "unknown"), time.perf_counter())
+
+    async def on_post_process_message(self, message, results, data: dict):
+        started = data.get("_metrics")
+        if started:
+            HANDLER_SECONDS.observe(time.perf_counter() - started[1], handler=started[0])
+
+
+async def monitor_loop_lag(interval=0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+async def start_http(host, port, registry=REGISTRY):
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"📊 Metrics on http://{host}:{port}/metrics")
+    return runner
+
+
+def write_snapshot(path, registry=REGISTRY):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+async def run_snapshots(path, interval=60, registry=REGISTRY):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_snapshot(path, registry)
+        except OSError as e:
+            logging.error(f"❌ Metrics snapshot error: {e}")
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+from metrics import OUTBOUND_WAIT_SECONDS, TELEGRAM_SEND_SECONDS
+from rate_limit import TokenBucket
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NOTIFY = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NOTIFY: "notify", PRIORITY_BULK: "bulk"}
+
+SEND_METHODS = frozenset({
+    "sendMessage", "forwardMessage", "copyMessage", "sendPhoto", "sendAudio", "sendDocument",
+    "sendVideo", "sendAnimation", "sendVoice", "sendVideoNote", "sendMediaGroup", "sendLocation",
+    "sendVenue", "sendContact", "sendPoll", "sendDice", "sendSticker", "editMessageText",
+})
+
+
+class OutboundScheduler:
+    # Спільний для всіх відправників ліміт: глобальний bucket + bucket на кожен чат.
+    def __init__(self, global_per_second=30, chat_per_second=1, chat_burst=3,
+                 group_per_minute=20, group_burst=3, max_chats=10000, samples=1000):
+        self.chat_per_second = chat_per_second
+        self.chat_burst = chat_burst
+        self.group_per_minute = group_per_minute
+        self.group_burst = group_burst
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chats = {}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump = None
+        self._waits = {priority: deque(maxlen=samples) for priority in PRIORITY_NAMES}
+        self.sent = 0
+        self.retries = 0
+
+    def _chat_bucket(self, chat_id):
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                self._prune()
+            if key.startswith("-"):
+                bucket = TokenBucket(self.group_per_minute / 60, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_per_second, self.chat_burst)
+            self._chats[key] = bucket
+        return bucket
+
+    def _prune(self):
+        # Повний bucket нічого не пам'ятає — його можна створити заново.
+        now = time.monotonic()
+        for key, bucket in list(self._chats.items()):
+            bucket._refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._chats[key]
+
+    async def wait_turn(self, chat_id=None, priority=PRIORITY_INTERACTIVE):
+        started = time.monotonic()
+        if chat_id is not None:
+            await self._chat_bucket(chat_id).acquire()
+        if self._waiters or not self._global.try_acquire():
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._release())
+            await future
+        waited = time.monotonic() - started
+        self._waits[priority].append(waited)
+        OUTBOUND_WAIT_SECONDS.observe(waited, priority=PRIORITY_NAMES.get(priority, priority))
+        self.sent += 1
+        return waited
+
+    async def _release(self):
+        # Черга за пріоритетом: інтерактивні відповіді обганяють нагадування.
+        while self._waiters:
+            delay = self._global.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+            else:
+                self._global.tokens += 1
+
+    def retry_after(self, chat_id, seconds):
+        self.retries += 1
+        logging.warning(f"⚠️ Telegram flood control for {chat_id}: retry in {seconds}s")
+        if chat_id is not None:
+            self._chat_bucket(chat_id).block(seconds)
+        else:
+            self._global.block(seconds)
+
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def stats(self):
+        stats = {"queued": len(self._waiters), "sent": self.sent, "retries": self.retries, "chats": len(self._chats)}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self._waits[priority])
+            if waits:
+                stats[f"{name}_wait_p50"] = waits[len(waits) // 2]
+                stats[f"{name}_wait_p95"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        return stats
+
+
+_schedulers = {}
+
+
+def scheduler_for(token, **options):
+    # Один планувальник на токен: нагадування, відповіді й сповіщення ділять ліміти.
+    scheduler = _schedulers.get(token)
+    if scheduler is None:
+        scheduler = _schedulers[token] = OutboundScheduler(**options)
+    return scheduler
+
+
+class ScheduledBot(Bot):
+    def __init__(self, token, *args, priority=PRIORITY_INTERACTIVE, max_retries=3, **kwargs):
+        super().__init__(token, *args, **kwargs)
+        self._scheduler_token = token
+        self.priority = priority
+        self.max_retries = max_retries
+
+    @property
+    def scheduler(self):
+        # Лінивий пошук: модуль нагадувань створює бота раніше, ніж bot.py налаштує ліміти.
+        return scheduler_for(self._scheduler_token)
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        if method not in SEND_METHODS:
+            return await super().request(method, data, files, **kwargs)
+        chat_id = (data or {}).get("chat_id")
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.wait_turn(chat_id, self.priority)
+            try:
+                with TELEGRAM_SEND_SECONDS.time(method=method):
+                    return await super().request(method, data, files, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.scheduler.retry_after(chat_id, e.timeout)
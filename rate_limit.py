@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, now: float = None) -> float:
+        # Забирає токен наперед і повертає, скільки секунд треба зачекати.
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def block(self, seconds: float, now: float = None):
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
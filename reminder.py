@@ -1,51 +1,95 @@
+import asyncio
+import logging
+import time
 from datetime import datetime, timedelta
-from aiogram import Bot
 from dotenv import load_dotenv
 import os
 
-from google_calendar import get_upcoming_events_for_reminders
+from google_calendar import get_upcoming_events_for_reminders, KYIV
+from keyboards import kyiv_now
+from outbound import ScheduledBot, PRIORITY_BULK
+from reminder_ledger import ReminderLedger
 
 load_dotenv()
 API_TOKEN = os.getenv("BOT_TOKEN")
-bot = Bot(token=API_TOKEN)
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "10"))
+REMINDER_LEDGER_PATH = os.getenv("BOT_DB_PATH", "data/bot.db")
+# Нагадування йдуть через спільний планувальник з найнижчим пріоритетом.
+bot = ScheduledBot(token=API_TOKEN, priority=PRIORITY_BULK)
 
-async def run_daily_check(offset_days=0):
+def appointment_start(record):
+    # Київський наївний час: із дзеркала приходить без зсуву, з API — з ним.
+    start = datetime.fromisoformat(record['datetime'])
+    if start.tzinfo is not None:
+        start = start.astimezone(KYIV).replace(tzinfo=None)
+    return start
+
+def format_reminder(record, days_left=None, now=None):
+    start = appointment_start(record)
+    if days_left is None:
+        now = now or kyiv_now()
+        days_left = (start.date() - now.date()).days
+    when = {0: "сьогодні ваш запис на", 1: "завтра у вас запис на"}.get(days_left, "ваш запис на")
+    return (
+        f"🔔 Нагадування: {when} {start.strftime('%Y-%m-%d %H:%M')}.\n"
+        f"🚗 {record['car']}\n🔧 {record['service_type']}"
+    )
+
+async def send_reminder(record, offset_minutes=None):
+    await bot.send_message(chat_id=int(record['chat_id']), text=format_reminder(record))
+
+async def run_daily_check(offset_days=0, load_reminders=get_upcoming_events_for_reminders, ledger=None,
+                          concurrency=REMINDER_CONCURRENCY):
+    # Повторний запуск (або перерваний) продовжує з місця зупинки: надіслане вже є в журналі.
     print(f"🔍 Запуск перевірки нагадувань... (offset_days={offset_days})")
+    started = time.monotonic()
+    summary = {'sent': 0, 'skipped': 0, 'failed': 0, 'duration': 0.0}
 
     try:
-        # 📅 Отримуємо всі події з extendedProperties
-        reminders = get_upcoming_events_for_reminders(days_ahead=offset_days)
+        # 📅 Отримуємо всі події з extendedProperties (з локального дзеркала, якщо воно свіже)
+        reminders = load_reminders(days_ahead=offset_days)
     except Exception as e:
         print(f"❌ Помилка при зчитуванні календаря: {e}")
-        return
-
-    for record in reminders:
-        chat_id = record['chat_id']
-        full_name = record['full_name']
-        service_type = record['service_type']
-        car = record['car']
-        dt_str = record['datetime']
+        summary['error'] = str(e)
+        return summary
 
-        if not chat_id or not dt_str:
-            continue
+    own_ledger = ledger is None
+    if own_ledger:
+        ledger = ReminderLedger(REMINDER_LEDGER_PATH)
+    slot = f"day{offset_days}"
+    gate = asyncio.Semaphore(concurrency)
 
+    async def deliver(record):
+        if not record.get('event_id') or not record.get('chat_id') or not record.get('datetime'):
+            summary['skipped'] += 1
+            return
         try:
-            dt_formatted = datetime.fromisoformat(dt_str).strftime("%Y-%m-%d %H:%M")
+            message = format_reminder(record, days_left=offset_days)
         except Exception as e:
-            print(f"❌ Не вдалося обробити дату: {dt_str} → {e}")
-            continue
+            logging.error(f"❌ Не вдалося обробити дату: {record['datetime']} → {e}")
+            summary['failed'] += 1
+            return
+        async with gate:
+            # Захоплюємо лише перед відправкою — після збою «зависають» щонайбільше concurrency записів.
+            if not ledger.claim(record['event_id'], slot, record['chat_id']):
+                summary['skipped'] += 1
+                return
+            try:
+                await bot.send_message(chat_id=int(record['chat_id']), text=message)
+            except Exception as e:
+                ledger.mark_failed(record['event_id'], slot, e)
+                logging.error(f"❌ Помилка надсилання до {record['chat_id']}: {e}")
+                summary['failed'] += 1
+                return
+        ledger.mark_sent(record['event_id'], slot)
+        summary['sent'] += 1
 
-        message = (
-            f"🔔 Нагадування: завтра у вас запис на {dt_formatted}.\n"
-            f"🚗 {car}\n🔧 {service_type}"
-            if offset_days == 1 else
-            f"🔔 Нагадування: сьогодні ваш запис на {dt_formatted}.\n"
-            f"🚗 {car}\n🔧 {service_type}"
-        )
-
-        try:
-            print(f"📨 Відправка повідомлення до {chat_id}: {message}")
-            await bot.send_message(chat_id=int(chat_id), text=message)
-            print("✅ Успішно відправлено")
-        except Exception as e:
-            print(f"❌ Помилка надсилання до {chat_id}: {e}")
+    try:
+        await asyncio.gather(*(deliver(record) for record in reminders))
+    finally:
+        if own_ledger:
+            ledger.close()
+    summary['duration'] = round(time.monotonic() - started, 3)
+    print(f"✅ Нагадування: надіслано {summary['sent']}, пропущено {summary['skipped']}, "
+          f"помилок {summary['failed']} за {summary['duration']} с")
+    return summary
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import time
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminder_ledger (
+    event_id TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    chat_id TEXT,
+    status TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    sent_at REAL,
+    error TEXT,
+    PRIMARY KEY (event_id, slot)
+);
+"""
+
+
+class ReminderLedger:
+    # Запис про кожне нагадування (подія + зсув). Спільний для всіх процесів через один файл БД.
+    def __init__(self, path, lease=600):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.lease = lease
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(LEDGER_SCHEMA)
+
+    def claim(self, event_id, slot, chat_id=None):
+        # True — нагадування наше. 'failed' перезахоплюється одразу, зависла 'sending' — після оренди.
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO reminder_ledger(event_id, slot, chat_id, status, claimed_at)
+                VALUES (?, ?, ?, 'sending', ?)
+                """,
+                (event_id, slot, str(chat_id or ""), now),
+            )
+            if cursor.rowcount:
+                return True
+            cursor = self._conn.execute(
+                """
+                UPDATE reminder_ledger SET status = 'sending', claimed_at = ?
+                WHERE event_id = ? AND slot = ?
+                  AND (status = 'failed' OR (status = 'sending' AND claimed_at < ?))
+                """,
+                (now, event_id, slot, now - self.lease),
+            )
+            return cursor.rowcount > 0
+
+    def mark_sent(self, event_id, slot):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE reminder_ledger SET status = 'sent', sent_at = ?, error = NULL WHERE event_id = ? AND slot = ?",
+                (time.time(), event_id, slot),
+            )
+
+    def mark_failed(self, event_id, slot, error):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE reminder_ledger SET status = 'failed', error = ? WHERE event_id = ? AND slot = ?",
+                (str(error), event_id, slot),
+            )
+
+    def is_sent(self, event_id, slot):
+        row = self._conn.execute(
+            "SELECT status FROM reminder_ledger WHERE event_id = ? AND slot = ?", (event_id, slot)
+        ).fetchone()
+        return row is not None and row[0] == "sent"
+
+    def purge(self, older_than_days=30):
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM reminder_ledger WHERE claimed_at < ?", (time.time() - older_than_days * 86400,)
+            )
+
+    def close(self):
+        self._conn.close()
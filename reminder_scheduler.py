@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import logging
+from datetime import timedelta
+
+from keyboards import kyiv_now
+from reminder import appointment_start
+
+
+class ReminderScheduler:
+    def __init__(self, load_upcoming, send, ledger, offsets=(1440, 120), horizon_hours=48,
+                 rescan_interval=120, late_grace=1800, retry_delay=60, max_retry_delay=600):
+        self.load_upcoming = load_upcoming
+        self.send = send
+        self.ledger = ledger
+        self.offsets = tuple(sorted(set(offsets), reverse=True))
+        self.horizon = timedelta(hours=max(horizon_hours, max(self.offsets) / 60 + 1))
+        self.rescan_interval = rescan_interval
+        self.late_grace = timedelta(seconds=late_grace)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._attempts = {}
+        self._heap = []
+        self._appointments = {}
+        self._version = 0
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._appointments)
+
+    def upsert(self, record):
+        event_id = record['event_id']
+        start = appointment_start(record)
+        current = self._appointments.get(event_id)
+        if current is not None and current[2] == start:
+            self._appointments[event_id] = (current[0], record, start)
+            return
+        # Перенесений запис отримує нову версію — старі елементи купи просто ігноруються.
+        self._version += 1
+        self._appointments[event_id] = (self._version, record, start)
+        for offset in self.offsets:
+            heapq.heappush(self._heap, (start - timedelta(minutes=offset), self._version, event_id, offset))
+        self._wakeup.set()
+
+    def cancel(self, event_id):
+        self._appointments.pop(event_id, None)
+
+    def resync(self, records):
+        seen = set()
+        for record in records:
+            seen.add(record['event_id'])
+            self.upsert(record)
+        for event_id in list(self._appointments):
+            if event_id not in seen:
+                self.cancel(event_id)
+        if len(self._heap) > 4 * len(self.offsets) * (len(self._appointments) + 1):
+            self._compact()
+
+    def _compact(self):
+        self._heap = [
+            item for item in self._heap
+            if self._appointments.get(item[2], (None,))[0] == item[1]
+        ]
+        heapq.heapify(self._heap)
+
+    def next_fire_in(self, now=None):
+        now = now or kyiv_now()
+        while self._heap:
+            fire_at, version, event_id, _ = self._heap[0]
+            if self._appointments.get(event_id, (None,))[0] == version:
+                return max(0.0, (fire_at - now).total_seconds())
+            heapq.heappop(self._heap)
+        return None
+
+    def due(self, now=None):
+        now = now or kyiv_now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, version, event_id, offset = heapq.heappop(self._heap)
+            entry = self._appointments.get(event_id)
+            if entry is None or entry[0] != version:
+                continue
+            _, record, start = entry
+            if start <= now or now - fire_at > self.late_grace:
+                # Запис створено вже після цього зсуву (або бот довго лежав) — не шлемо запізнілих.
+                self.skipped += 1
+                continue
+            due.append((record, offset))
+        return due
+
+    async def deliver(self, record, offset):
+        event_id, slot = record['event_id'], f"{offset}m"
+        if not self.ledger.claim(event_id, slot, record.get('chat_id')):
+            self.skipped += 1
+            return
+        try:
+            await self.send(record, offset)
+        except Exception as e:
+            self.failed += 1
+            self.ledger.mark_failed(event_id, slot, e)
+            logging.error(f"❌ Reminder {event_id}/{slot} failed: {e}")
+            self._retry(event_id, offset)
+            return
+        self._attempts.pop((event_id, offset), None)
+        self.sent += 1
+        self.ledger.mark_sent(event_id, slot)
+
+    def _retry(self, event_id, offset, now=None):
+        # Невдале нагадування повертається в купу з наростаючою паузою, поки не мине late_grace.
+        entry = self._appointments.get(event_id)
+        attempts = self._attempts.pop((event_id, offset), 0) + 1
+        if entry is None:
+            return
+        version, _, start = entry
+        now = now or kyiv_now()
+        retry_at = now + timedelta(seconds=min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay))
+        if retry_at >= start or retry_at - (start - timedelta(minutes=offset)) > self.late_grace:
+            logging.warning(f"⚠️ Reminder {event_id}/{offset}m: спроби вичерпано ({attempts})")
+            return
+        self._attempts[(event_id, offset)] = attempts
+        heapq.heappush(self._heap, (retry_at, version, event_id, offset))
+        self._wakeup.set()
+
+    async def rescan(self):
+        now = kyiv_now()
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(None, self.load_upcoming, now, now + self.horizon)
+        self.resync(records)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_scan = 0.0
+        while True:
+            if loop.time() >= next_scan:
+                try:
+                    await self.rescan()
+                except Exception as e:
+                    logging.error(f"❌ Reminder rescan error: {e}")
+                next_scan = loop.time() + self.rescan_interval
+            due = self.due()
+            if due:
+                await asyncio.gather(*(self.deliver(record, offset) for record, offset in due))
+            delay = next_scan - loop.time()
+            fire_in = self.next_fire_in()
+            if fire_in is not None:
+                delay = min(delay, fire_in)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        return {
+            "appointments": len(self._appointments),
+            "queued": len(self._heap),
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
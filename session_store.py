@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+SESSION_FIELDS = (
+    "step", "service_type", "brand", "car", "year", "subtype",
+    "selected_date", "datetime", "phone",
+)
+_FIELD_SET = frozenset(SESSION_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+"""
+
+
+class Session:
+    __slots__ = SESSION_FIELDS + ("touched", "dirty")
+
+    def __init__(self, **values):
+        for name in SESSION_FIELDS:
+            object.__setattr__(self, name, values.get(name))
+        object.__setattr__(self, "touched", time.time())
+        object.__setattr__(self, "dirty", True)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _FIELD_SET:
+            object.__setattr__(self, "dirty", True)
+
+    def update(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in SESSION_FIELDS if getattr(self, name) is not None}
+
+
+class SQLiteSessionBackend:
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def load(self, user_id):
+        row = self._conn.execute(
+            "SELECT data, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def save_many(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO sessions(user_id, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at
+                """,
+                [(uid, json.dumps(data, ensure_ascii=False), ts) for uid, data, ts in rows],
+            )
+
+    def delete_many(self, user_ids):
+        with self._conn:
+            self._conn.executemany("DELETE FROM sessions WHERE user_id = ?", [(uid,) for uid in user_ids])
+
+    def purge(self, before):
+        with self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (before,))
+
+    def close(self):
+        self._conn.close()
+
+
+class SessionStore:
+    def __init__(self, ttl=3600, max_sessions=10000, backend=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.backend = backend
+        self._sessions = OrderedDict()
+        self._evicted = {}
+        self._deleted = set()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, user_id):
+        now = time.time()
+        session = self._sessions.get(user_id)
+        if session is not None:
+            if now - session.touched > self.ttl:
+                self._expire(user_id)
+            else:
+                self._sessions.move_to_end(user_id)
+                object.__setattr__(session, "touched", now)
+                self.hits += 1
+                return session
+        session = self._load(user_id, now)
+        if session is None:
+            self.misses += 1
+            return None
+        self.loads += 1
+        self._insert(user_id, session)
+        return session
+
+    def create(self, user_id, **values):
+        self._deleted.discard(user_id)
+        self._evicted.pop(user_id, None)
+        session = Session(**values)
+        self._sessions.pop(user_id, None)
+        self._insert(user_id, session)
+        return session
+
+    def pop(self, user_id):
+        session = self._sessions.pop(user_id, None)
+        self._evicted.pop(user_id, None)
+        if self.backend is not None:
+            self._deleted.add(user_id)
+        return session
+
+    def sweep(self):
+        cutoff = time.time() - self.ttl
+        expired = 0
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff:
+                break
+            self._expire(user_id)
+            expired += 1
+        return expired
+
+    def flush(self):
+        if self.backend is None:
+            return 0
+        rows = [(uid, data, ts) for uid, (data, ts) in self._evicted.items()]
+        self._evicted.clear()
+        for user_id, session in self._sessions.items():
+            if session.dirty:
+                rows.append((user_id, session.to_dict(), session.touched))
+                object.__setattr__(session, "dirty", False)
+        if rows:
+            self.backend.save_many(rows)
+        if self._deleted:
+            self.backend.delete_many(list(self._deleted))
+            self._deleted.clear()
+        self.backend.purge(time.time() - self.ttl)
+        return len(rows)
+
+    async def run_maintenance(self, interval=30):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep()
+                self.flush()
+            except Exception as e:
+                logging.error(f"❌ Session maintenance error: {e}")
+
+    def stats(self):
+        return {
+            "size": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self):
+        self.sweep()
+        self.flush()
+        if self.backend is not None:
+            self.backend.close()
+
+    def _load(self, user_id, now):
+        if self.backend is None or user_id in self._deleted:
+            return None
+        evicted = self._evicted.pop(user_id, None)
+        if evicted is not None:
+            data, touched = evicted
+        else:
+            try:
+                data, touched = self.backend.load(user_id)
+            except sqlite3.Error as e:
+                logging.error(f"❌ Session load error: {e}")
+                return None
+        if data is None or now - touched > self.ttl:
+            return None
+        session = Session(**data)
+        object.__setattr__(session, "dirty", evicted is not None)
+        return session
+
+    def _insert(self, user_id, session):
+        self._sessions[user_id] = session
+        while len(self._sessions) > self.max_sessions:
+            old_id, old = self._sessions.popitem(last=False)
+            self.evictions += 1
+            if self.backend is not None and old.dirty:
+                self._evicted[old_id] = (old.to_dict(), old.touched)
+
+    def _expire(self, user_id):
+        self._sessions.pop(user_id, None)
+        self.expirations += 1
+        if self.backend is not None:
+            self._deleted.add(user_id)
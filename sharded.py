@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+STOP = None
+
+
+def routing_key(update):
+    for name, value in update.items():
+        if name == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or (value.get("message") or {}).get("from")
+        if user:
+            return user["id"]
+        chat = value.get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def worker_main(shard, workers, inbox, metrics, max_concurrency, report_interval):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[shard {shard}] %(levelname)s:%(name)s:%(message)s")
+    asyncio.run(_worker(shard, workers, inbox, metrics, max_concurrency, report_interval))
+
+
+def shard_env(shard, workers, environ=os.environ):
+    # Кожен шард — окремий процес зі своїми метриками: свій порт, свій файл знімків і свій спул.
+    # Фонові задачі й планувальник — лише на шарді 0, ліміти Telegram bot.py ділить на workers.
+    env = {"BOT_SHARD": str(shard), "BOT_SHARDS": str(workers)}
+    port = int(environ.get("METRICS_PORT", "9108"))
+    if port:
+        env["METRICS_PORT"] = str(port + 1 + shard)
+    snapshot = environ.get("METRICS_SNAPSHOT_PATH", "data/metrics.json")
+    if snapshot:
+        root, ext = os.path.splitext(snapshot)
+        env["METRICS_SNAPSHOT_PATH"] = f"{root}.shard{shard}{ext}"
+    root, ext = os.path.splitext(environ.get("DESKTOP_SPOOL_PATH", "data/desktop_spool.jsonl"))
+    env["DESKTOP_SPOOL_PATH"] = f"{root}.shard{shard}{ext}"
+    return env
+
+
+async def _worker(shard, workers, inbox, metrics, max_concurrency, report_interval):
+    from aiogram import Bot, Dispatcher, types
+    import bot as bot_module
+
+    # spawn імпортує main.py (а з ним і bot) ще до цього виклику, тож налаштування шарда мали прийти
+    # через оточення процесу — див. ShardedRuntime.start.
+    if (bot_module.BOT_SHARD, bot_module.BOT_SHARDS) != (shard, workers):
+        raise RuntimeError(
+            f"bot loaded as shard {bot_module.BOT_SHARD}/{bot_module.BOT_SHARDS}, expected {shard}/{workers}"
+        )
+    dp = bot_module.dp
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await bot_module.on_startup(dp)
+    if bot_module.RUN_BACKGROUND:
+        bot_module.schedule_jobs()
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    locks = {}
+    waits, handles = [], []
+    counters = {"processed": 0, "failed": 0}
+    tasks = set()
+
+    async def process(key, update, enqueued_at):
+        # Оновлення одного користувача обробляються строго по черзі.
+        entry = locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], semaphore:
+                started = time.time()
+                waits.append(started - enqueued_at)
+                try:
+                    await dp.process_update(types.Update(**update))
+                    counters["processed"] += 1
+                except Exception as e:
+                    counters["failed"] += 1
+                    logging.error(f"❌ Shard {shard} update error: {e}")
+                handles.append(time.time() - started)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                locks.pop(key, None)
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            metrics.put({
+                "shard": shard,
+                "processed": counters["processed"],
+                "failed": counters["failed"],
+                "in_flight": len(tasks),
+                "wait_p50": percentile(waits, 0.5),
+                "wait_p95": percentile(waits, 0.95),
+                "handle_p50": percentile(handles, 0.5),
+                "handle_p95": percentile(handles, 0.95),
+            })
+            waits.clear()
+            handles.clear()
+
+    reporter = asyncio.create_task(report())
+    while True:
+        item = await loop.run_in_executor(None, inbox.get)
+        if item is STOP:
+            break
+        task = asyncio.create_task(process(*item))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    reporter.cancel()
+    if tasks:
+        await asyncio.wait(set(tasks), timeout=30)
+    await bot_module.on_shutdown(dp)
+    session = await dp.bot.get_session()
+    await session.close()
+
+
+class ShardedRuntime:
+    def __init__(self, workers=2, max_concurrency=32, report_interval=30, queue_size=1000):
+        self.workers = workers
+        self.report_interval = report_interval
+        ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.metrics = ctx.Queue()
+        self.processes = [
+            ctx.Process(
+                target=worker_main,
+                args=(i, workers, self.inboxes[i], self.metrics, max_concurrency, report_interval),
+                name=f"bot-shard-{i}",
+            )
+            for i in range(workers)
+        ]
+        self.stats = {i: {} for i in range(workers)}
+        self.routed = [0] * workers
+
+    def start(self):
+        # Дочірній процес (spawn) успадковує оточення на момент start(); bot.py читає його при імпорті.
+        for shard, process in enumerate(self.processes):
+            env = shard_env(shard, self.workers)
+            saved = {name: os.environ.get(name) for name in env}
+            os.environ.update(env)
+            try:
+                process.start()
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+    def stop(self, timeout=40):
+        for inbox in self.inboxes:
+            inbox.put(STOP)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logging.error(f"❌ {process.name} не завершився, зупиняємо примусово")
+                process.terminate()
+
+    def queue_depths(self):
+        depths = []
+        for inbox in self.inboxes:
+            try:
+                depths.append(inbox.qsize())
+            except NotImplementedError:
+                depths.append(-1)
+        return depths
+
+    async def route(self, update):
+        key = routing_key(update)
+        shard = key % self.workers
+        self.routed[shard] += 1
+        item = (key, update, time.time())
+        try:
+            self.inboxes[shard].put_nowait(item)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self.inboxes[shard].put, item)
+
+    def collect_metrics(self):
+        while True:
+            try:
+                sample = self.metrics.get_nowait()
+            except queue.Empty:
+                break
+            self.stats[sample["shard"]] = sample
+        depths = self.queue_depths()
+        for shard, depth in enumerate(depths):
+            self.stats[shard]["queue_depth"] = depth
+            self.stats[shard]["routed"] = self.routed[shard]
+        return self.stats
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            for shard, stats in self.collect_metrics().items():
+                logging.info(
+                    f"📊 shard {shard}: queue={stats.get('queue_depth')} routed={stats.get('routed')} "
+                    f"processed={stats.get('processed', 0)} failed={stats.get('failed', 0)} "
+                    f"wait p95={stats.get('wait_p95', 0) * 1000:.1f}ms "
+                    f"handle p50={stats.get('handle_p50', 0) * 1000:.1f}ms p95={stats.get('handle_p95', 0) * 1000:.1f}ms"
+                )
+
+    async def poll(self, dp, timeout=20):
+        await dp.reset_webhook(check=True)
+        await dp.skip_updates()
+        reporter = asyncio.create_task(self._report())
+        offset = None
+        try:
+            while True:
+                try:
+                    updates = await dp.bot.get_updates(offset=offset, timeout=timeout)
+                except Exception as e:
+                    logging.error(f"❌ getUpdates error: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                for update in updates:
+                    await self.route(update.to_python())
+                    offset = update.update_id + 1
+        finally:
+            reporter.cancel()
+
+
+def run_sharded(dp, workers=2, max_concurrency=32, report_interval=30, queue_size=1000):
+    runtime = ShardedRuntime(workers, max_concurrency, report_interval, queue_size)
+    runtime.start()
+    loop = asyncio.get_event_loop()
+    poll_task = loop.create_task(runtime.poll(dp))
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, poll_task.cancel)
+    try:
+        loop.run_until_complete(poll_task)
+    except asyncio.CancelledError:
+        logging.info("⏹ Зупинка шардованого рантайму...")
+    finally:
+        runtime.stop()
+        session = loop.run_until_complete(dp.bot.get_session())
+        loop.run_until_complete(session.close())
@@ -0,0 +1,32 @@
+import logging
+
+from metrics import STEP_SECONDS
+
+
+class StepRouter:
+    def __init__(self, transitions):
+        self.transitions = {step: frozenset(targets) for step, targets in transitions.items()}
+        self._handlers = {}
+
+    def step(self, name):
+        if name not in self.transitions:
+            raise ValueError(f"Unknown step: {name}")
+
+        def decorator(handler):
+            self._handlers[name] = handler
+            return handler
+        return decorator
+
+    def handler_for(self, step):
+        return self._handlers.get(step)
+
+    async def dispatch(self, session, message):
+        step = session.step
+        handler = self._handlers.get(step)
+        if handler is None:
+            return False
+        with STEP_SECONDS.time(step=step):
+            await handler(message, session)
+        if session.step != step and session.step not in self.transitions[step]:
+            logging.warning(f"⚠️ Недозволений перехід {step} → {session.step}")
+        return True
@@ -0,0 +1,92 @@
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from rate_limit import TokenBucket
+
+DEFAULT_LIMITS = "default=40/8,start=6/2"
+WARNING_TEXT = "⏳ Забагато повідомлень, зачекайте кілька секунд."
+
+
+def parse_limits(spec):
+    # "default=40/8,start=6/2" → {"default": (повідомлень за хвилину, burst), ...}
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        per_minute, _, burst = value.partition("/")
+        limits[name.strip()] = (float(per_minute), float(burst or 1))
+    if "default" not in limits:
+        raise ValueError(f"Throttle limits need a 'default' entry: {spec!r}")
+    return limits
+
+
+class _UserThrottle:
+    __slots__ = ("bucket", "warned", "seen")
+
+    def __init__(self, bucket, now):
+        self.bucket = bucket
+        self.warned = False
+        self.seen = now
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, limits, classify=None, warn=True, ttl=600, max_users=50000,
+                 warning_text=WARNING_TEXT):
+        super().__init__()
+        self.limits = limits
+        self.classify = classify or (lambda message: "default")
+        self.warn = warn
+        self.ttl = ttl
+        self.max_users = max_users
+        self.warning_text = warning_text
+        self._users = OrderedDict()
+        self.passed = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._users)
+
+    def _state_for(self, user_id, limit, now):
+        key = (user_id, limit)
+        state = self._users.get(key)
+        if state is None:
+            per_minute, burst = self.limits.get(limit) or self.limits["default"]
+            state = _UserThrottle(TokenBucket(per_minute / 60, burst), now)
+            self._users[key] = state
+        else:
+            self._users.move_to_end(key)
+            state.seen = now
+        self._expire(now)
+        return state
+
+    def _expire(self, now):
+        # Записи впорядковані за останньою активністю — прибираємо з голови.
+        cutoff = now - self.ttl
+        while self._users:
+            key, state = next(iter(self._users.items()))
+            if state.seen >= cutoff and len(self._users) <= self.max_users:
+                break
+            del self._users[key]
+
+    async def on_pre_process_message(self, message: types.Message, data: dict):
+        if message.from_user is None:
+            return
+        now = time.monotonic()
+        state = self._state_for(message.from_user.id, self.classify(message), now)
+        if state.bucket.try_acquire(now):
+            state.warned = False
+            self.passed += 1
+            return
+        self.dropped += 1
+        if self.warn and not state.warned:
+            state.warned = True
+            logging.info(f"⏳ Throttled user {message.from_user.id}")
+            await message.answer(self.warning_text)
+        raise CancelHandler()
+
+    def stats(self):
+        return {"tracked": len(self._users), "passed": self.passed, "dropped": self.dropped}
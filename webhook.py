@@ -0,0 +1,105 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(self, dp, secret="", max_concurrency=32, drain_timeout=30):
+        self.dp = dp
+        self.secret = secret
+        self.drain_timeout = drain_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self._accepting = True
+
+    async def handle(self, request):
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            logging.error("❌ Webhook: невірний secret token")
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            update = types.Update(**await request.json())
+        except (ValueError, TypeError):
+            return web.Response(status=400)
+        # Чекаємо на вільний слот тут, щоб тиснути назад на Telegram, а не копити задачі в пам'яті.
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(status=200)
+
+    async def _process(self, update):
+        Bot.set_current(self.dp.bot)
+        Dispatcher.set_current(self.dp)
+        try:
+            await self.dp.process_update(update)
+        except Exception as e:
+            logging.error(f"❌ Webhook update {update.update_id} error: {e}")
+        finally:
+            self._semaphore.release()
+
+    def in_flight(self):
+        return len(self._tasks)
+
+    async def drain(self):
+        self._accepting = False
+        if not self._tasks:
+            return
+        logging.info(f"⏳ Очікуємо завершення {len(self._tasks)} оновлень...")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.error(f"❌ Webhook drain: скасовано {len(pending)} оновлень")
+
+
+def make_webhook_app(dp, path, secret="", max_concurrency=32, drain_timeout=30,
+                     webhook_url=None, on_startup=None, on_shutdown=None):
+    if not secret:
+        logging.warning(
+            "⚠️ WEBHOOK_SECRET не задано: заголовок X-Telegram-Bot-Api-Secret-Token не перевіряється, "
+            f"будь-хто, хто знає {path}, може надсилати боту оновлення"
+        )
+    server = WebhookServer(dp, secret, max_concurrency, drain_timeout)
+    app = web.Application()
+    app["webhook_server"] = server
+    app.router.add_post(path, server.handle)
+
+    async def _startup(app):
+        if webhook_url:
+            await dp.bot.set_webhook(
+                webhook_url.rstrip("/") + path,
+                secret_token=secret or None,
+                max_connections=min(max_concurrency, 100),
+                drop_pending_updates=True,
+            )
+        if on_startup:
+            await on_startup(dp)
+
+    async def _shutdown(app):
+        await server.drain()
+        if on_shutdown:
+            await on_shutdown(dp)
+        await dp.storage.close()
+        await dp.storage.wait_closed()
+        session = await dp.bot.get_session()
+        await session.close()
+
+    app.on_startup.append(_startup)
+    app.on_shutdown.append(_shutdown)
+    return app
+
+
+def run_webhook(dp, webhook_url, path, secret, host, port, max_concurrency=32,
+                drain_timeout=30, on_startup=None, on_shutdown=None):
+    app = make_webhook_app(
+        dp, path, secret, max_concurrency, drain_timeout,
+        webhook_url=webhook_url, on_startup=on_startup, on_shutdown=on_shutdown,
+    )
+    web.run_app(app, host=host, port=port, loop=asyncio.get_event_loop())